@@ -0,0 +1,101 @@
+"""Micro-benchmark for the JSON response encoder on a GET /tasks sized payload.
+
+Builds 10k tasks shaped like handle_get_tasks output (embedded comments,
+attachments, user and team details) and times:
+
+  * the old json.dumps(payload, default=str).encode("utf-8")
+  * the services' json_bytes() (orjson)
+
+    python bench/json_serialization.py --tasks 10000 --repeat 10
+
+Run it where mysql-connector-python and orjson are installed, since it
+imports common/pms_common.py. Each round runs every encoder once on a fresh
+payload, so warm-up and GC pressure hit them alike.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+PMS_COMMON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common", "pms_common.py")
+
+
+def load_pms_common():
+    spec = importlib.util.spec_from_file_location("pms_common", PMS_COMMON)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_payload(count):
+    base = datetime(2026, 1, 1, 9, 30)
+    tasks = []
+    for i in range(count):
+        created = base + timedelta(minutes=i)
+        tasks.append({
+            "id": i + 1,
+            "title": f"Task {i + 1}",
+            "description": "Follow up with the team about the release checklist.",
+            "status": ("TODO", "IN_PROGRESS", "DONE")[i % 3],
+            "priority": ("LOW", "MEDIUM", "HIGH")[i % 3],
+            "team_id": i % 40 + 1,
+            "created_by": i % 200 + 1,
+            "assigned_to": i % 300 + 1,
+            "due_date": date(2026, 2, 1) + timedelta(days=i % 60) if i % 4 else None,
+            "created_at": created,
+            "comments": [
+                {"id": i * 2 + j, "task_id": i + 1, "author_id": j + 1,
+                 "content": "Looks good to me.", "created_at": created + timedelta(hours=j)}
+                for j in range(2)
+            ],
+            "attachments": [
+                {"id": i + 1, "task_id": i + 1, "author_id": 1, "url": "/files/3f2a.pdf",
+                 "original_name": "spec.pdf", "content_hash": "3f2a" * 16, "size": 48213,
+                 "created_at": created}
+            ] if i % 2 else [],
+            "assigned_to_user": {"id": i % 300 + 1, "username": f"user{i % 300 + 1}", "role": "MEMBER"},
+            "team": {"id": i % 40 + 1, "name": f"Team {i % 40 + 1}", "leader_id": 1},
+        })
+    return tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=10000, help="number of tasks in the payload")
+    parser.add_argument("--repeat", type=int, default=10, help="rounds; the best and median times are reported")
+    args = parser.parse_args()
+
+    service = load_pms_common()
+    cases = [
+        ("json.dumps(default=str)", lambda payload: json.dumps(payload, default=str).encode("utf-8")),
+        ("json_bytes (orjson)", service.json_bytes),
+    ]
+    payload = build_payload(args.tasks)
+    expected = json.loads(json.dumps(payload, default=lambda value: value.isoformat()))
+    if json.loads(service.json_bytes(payload)) != expected:
+        raise SystemExit("json_bytes output doesn't match the payload")
+
+    times = {name: [] for name, _ in cases}
+    sizes = {}
+    for _ in range(args.repeat):
+        for name, encode in cases:
+            payload = build_payload(args.tasks)
+            start = time.perf_counter()
+            body = encode(payload)
+            times[name].append(time.perf_counter() - start)
+            sizes[name] = len(body)
+
+    print(f"{args.tasks} tasks, {args.repeat} rounds")
+    baseline = None
+    for name, _ in cases:
+        best, median = min(times[name]), statistics.median(times[name])
+        baseline = baseline or median
+        print(f"{name:<26} best {best * 1000:7.1f} ms  median {median * 1000:7.1f} ms  "
+              f"{sizes[name] / 1024:8.0f} KiB  x{baseline / median:.1f}")
+
+
+if __name__ == "__main__":
+    main()
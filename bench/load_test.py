@@ -0,0 +1,79 @@
+"""Simple closed-loop load generator for the PMS services.
+
+Runs the same GET request with an increasing number of concurrent clients and
+prints the throughput for each level, e.g.
+
+    python bench/load_test.py http://localhost:8082/tasks --username admin --password admin
+
+It logs in through user-service first and sends the returned token with every request.
+
+With the pooled server mode throughput should grow with the number of clients
+until the worker pool (SERVER_WORKERS) is saturated; with SERVER_MODE=single it
+stays flat.
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _client(url, headers, deadline, results, lock):
+    ok = errors = 0
+    latencies = []
+    while time.perf_counter() < deadline:
+        req = urllib.request.Request(url, headers=headers)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                resp.read()
+            ok += 1
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors += 1
+    with lock:
+        results["ok"] += ok
+        results["errors"] += errors
+        results["latencies"].extend(latencies)
+
+
+def run_level(url, headers, clients, duration):
+    results = {"ok": 0, "errors": 0, "latencies": []}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(_client, url, headers, deadline, results, lock)
+    lat = sorted(results["latencies"])
+    p50 = lat[len(lat) // 2] * 1000 if lat else 0.0
+    p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000 if lat else 0.0
+    return results["ok"] / duration, p50, p99, results["errors"]
+
+
+def login(login_url, username, password):
+    body = json.dumps({"username": username, "password": password}).encode("utf-8")
+    req = urllib.request.Request(login_url, data=body, method="POST", headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())["token"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--clients", default="1,2,4,8,16,32", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--login-url", default="http://localhost:8080/login", help="user-service POST /login")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {login(args.login_url, args.username, args.password)}"}
+    print(f"{'clients':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for clients in (int(c) for c in args.clients.split(",")):
+        rps, p50, p99, errors = run_level(args.url, headers, clients, args.duration)
+        print(f"{clients:>8} {rps:>10.1f} {p50:>10.1f} {p99:>10.1f} {errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,834 @@
+# Code shared by user-service, team-service and task-service. Each service's
+# Dockerfile copies this file next to its main.py (see docker-compose.yml), so a
+# fix made here reaches all three.
+import json
+import gzip
+import io
+import base64
+import bisect
+import re
+import hmac
+import hashlib
+import secrets
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, date, timedelta, timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import mysql.connector
+import orjson
+try:
+    import brotli
+except ImportError: # optional: without it responses are only gzip-compressed
+    brotli = None
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a bounded pool of worker threads.
+
+    The accept loop blocks once every worker is busy, so at most `workers`
+    requests hold a database connection at the same time and the rest wait
+    in the listen backlog instead of failing on an exhausted pool.
+    """
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers):
+        super().__init__(server_address, handler_class)
+        self._slots = threading.BoundedSemaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http-worker")
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            self._executor.submit(self._process_request_worker, request, client_address)
+        except Exception:
+            self._slots.release()
+            self.shutdown_request(request)
+            raise
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def make_server(server_address, handler_class, workers, pooled_class=PooledHTTPServer, single_class=HTTPServer):
+    # SERVER_MODE=single keeps the old one-request-at-a-time server (handy when debugging)
+    if os.getenv("SERVER_MODE", "pool").lower() == "single":
+        return single_class(server_address, handler_class)
+    return pooled_class(server_address, handler_class, workers)
+
+
+# Versioned schema migrations live in db/migrations as NNN_description.sql and are
+# mounted into every service container (see docker-compose.yml).
+MIGRATIONS_DIR = os.getenv("MIGRATIONS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations"))
+# MySQL errors that mean "already there": duplicate column name, duplicate key name
+_MIGRATION_IGNORED_ERRNOS = (1060, 1061)
+
+def _split_sql(sql):
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+def apply_migrations(conn, service_name):
+    """Apply pending migrations in version order and record them in schema_migrations.
+
+    All services call this at startup; a MySQL named lock makes sure only one of
+    them applies a given migration while the others wait and then skip it.
+    """
+    if os.getenv("RUN_MIGRATIONS", "1") != "1":
+        return
+    if not os.path.isdir(MIGRATIONS_DIR):
+        print(f"{service_name}: no migrations directory at {MIGRATIONS_DIR}, skipping")
+        return
+
+    cur = conn.cursor()
+    cur.execute("SELECT GET_LOCK('pms_schema_migrations', 60)")
+    if cur.fetchone()[0] != 1:
+        cur.close()
+        raise Exception("Timed out waiting for the schema migration lock")
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+              version INT PRIMARY KEY,
+              name VARCHAR(255) NOT NULL,
+              applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cur.fetchall()}
+
+        pending = []
+        for fname in os.listdir(MIGRATIONS_DIR):
+            if fname.endswith(".sql") and fname.split("_", 1)[0].isdigit():
+                pending.append((int(fname.split("_", 1)[0]), fname))
+        for version, fname in sorted(pending):
+            if version in applied:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, fname), encoding="utf-8") as fh:
+                statements = _split_sql(fh.read())
+            for statement in statements:
+                try:
+                    cur.execute(statement)
+                    if cur.with_rows:
+                        cur.fetchall()
+                except mysql.connector.Error as e:
+                    if e.errno not in _MIGRATION_IGNORED_ERRNOS:
+                        raise
+                    print(f"{service_name}: {fname}: already applied ({e.msg})")
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, fname))
+            conn.commit()
+            print(f"{service_name}: applied migration {fname}")
+    finally:
+        cur.execute("SELECT RELEASE_LOCK('pms_schema_migrations')")
+        cur.fetchall()
+        cur.close()
+
+
+# task-service caches user/team details; user-service and team-service tell it when
+# they change so it does not serve stale data until the TTL runs out. Fire-and-forget:
+# a failed call only means the entry expires on its own.
+TASK_SERVICE_URL = os.getenv("TASK_SERVICE_URL", "http://task-service:8082")
+
+def upstream_error_reason(exc):
+    """upstream_errors_total reason for a failed urllib call: the categories task-service's ServiceClient reports."""
+    if isinstance(exc, urllib.error.HTTPError):
+        return "http_5xx" if exc.code >= 500 else "http_4xx"
+    if isinstance(exc, urllib.error.URLError):
+        exc = exc.reason
+    return "timeout" if isinstance(exc, TimeoutError) else "connection"
+
+def notify_cache_invalidation(kind, ids):
+    def _send():
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            body = json.dumps({kind: list(ids)}).encode("utf-8")
+            req = urllib.request.Request(f"{TASK_SERVICE_URL}/cache/invalidate", data=body, method="POST",
+                                         headers={"Content-Type": "application/json", INTERNAL_SECRET_HEADER: INTERNAL_SECRET})
+            urllib.request.urlopen(req, timeout=2).close()
+            outcome = "ok"
+        except Exception as e:
+            metrics.inc("upstream_errors_total", ("task-service", upstream_error_reason(e)))
+            print(f"Cache invalidation of {kind} {ids} failed: {e}")
+        finally:
+            metrics.observe("upstream_request_duration_seconds", ("task-service", outcome), time.perf_counter() - started)
+    threading.Thread(target=_send, daemon=True).start()
+
+
+# Access tokens issued by user-service: base64url(JSON claims) + "." + base64url(HMAC-SHA256).
+# Claims: sub (user id), role, iat, exp, jti. Every service shares TOKEN_SECRET and
+# verifies tokens locally, without a database round trip.
+TOKEN_SECRET = os.getenv("TOKEN_SECRET", "dev-secret-change-me").encode("utf-8")
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", "43200")) # seconds
+REVOCATION_REFRESH = float(os.getenv("REVOCATION_REFRESH", "5")) # seconds between revocation list reloads
+
+def background_connection():
+    """A connection of its own (outside the request pool) for a background thread, in autocommit."""
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASS", ""),
+        database=os.getenv("DB_NAME", "pms"),
+        autocommit=True,
+    )
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(payload_b64):
+    return hmac.new(TOKEN_SECRET, payload_b64.encode("ascii"), hashlib.sha256).digest()
+
+
+class RevocationList:
+    """In-memory copy of token_revocations, reloaded from MySQL in the background."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jtis = set()
+        self._not_before = {} # user_id -> epoch; tokens issued earlier are revoked
+
+    def is_revoked(self, claims):
+        with self._lock:
+            return claims.get("jti") in self._jtis or claims.get("iat", 0) < self._not_before.get(claims.get("sub"), 0)
+
+    def add(self, jti=None, user_id=None, not_before=None):
+        with self._lock:
+            if jti:
+                self._jtis.add(jti)
+            if user_id is not None:
+                self._not_before[user_id] = max(self._not_before.get(user_id, 0), not_before)
+
+    def reload(self, conn):
+        cur = conn.cursor()
+        cur.execute("SELECT jti, user_id, not_before FROM token_revocations WHERE expires_at > %s", (time.time(),))
+        jtis, not_before = set(), {}
+        for jti, user_id, ts in cur.fetchall():
+            if jti:
+                jtis.add(jti)
+            elif user_id is not None:
+                not_before[user_id] = max(not_before.get(user_id, 0), ts)
+        cur.close()
+        with self._lock:
+            self._jtis = jtis
+            self._not_before = not_before
+
+    def start(self, service_name):
+        # Uses its own connection so reloads never compete with requests for a pooled one
+        def _loop():
+            conn = None
+            while True:
+                try:
+                    if conn is None or not conn.is_connected():
+                        conn = background_connection()
+                    self.reload(conn)
+                except Exception as e:
+                    print(f"{service_name}: could not reload token revocations ({e})")
+                    conn = None
+                time.sleep(REVOCATION_REFRESH)
+        threading.Thread(target=_loop, name="token-revocations", daemon=True).start()
+
+
+revocations = RevocationList()
+
+def verify_token(token):
+    """Return the claims of a valid, unexpired, unrevoked token, or None."""
+    try:
+        payload_b64, signature_b64 = token.split(".")
+        if not hmac.compare_digest(_sign(payload_b64), _b64decode(signature_b64)):
+            return None
+        claims = json.loads(_b64decode(payload_b64))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(claims, dict) or claims.get("exp", 0) < time.time() or revocations.is_revoked(claims):
+        return None
+    return claims
+
+# Calls between the services (task-service's user/team lookups, cache invalidation) carry
+# no user token: they authenticate with this shared secret and pass the caller's identity,
+# if any, in X-User-Id / X-User-Role.
+INTERNAL_SECRET = os.getenv("INTERNAL_SECRET", "dev-internal-secret-change-me")
+INTERNAL_SECRET_HEADER = "X-Internal-Secret"
+
+def is_internal_call(headers):
+    secret = headers.get(INTERNAL_SECRET_HEADER)
+    return secret is not None and hmac.compare_digest(secret.encode("utf-8"), INTERNAL_SECRET.encode("utf-8"))
+
+def issue_token(user):
+    now = time.time()
+    claims = {"sub": user["id"], "role": user["role"], "iat": now, "exp": now + TOKEN_TTL, "jti": secrets.token_hex(16)}
+    payload_b64 = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload_b64}.{_b64encode(_sign(payload_b64))}"
+
+def revoke_token(conn, claims):
+    cur = conn.cursor()
+    cur.execute("INSERT INTO token_revocations (jti, user_id, not_before, expires_at) VALUES (%s, %s, %s, %s)",
+                (claims["jti"], claims["sub"], claims["iat"], claims["exp"]))
+    cur.close()
+    revocations.add(jti=claims["jti"])
+
+def revoke_user_tokens(conn, user_id):
+    # Role and active status are baked into tokens, so changing them invalidates every token the user holds
+    now = time.time()
+    cur = conn.cursor()
+    cur.execute("INSERT INTO token_revocations (jti, user_id, not_before, expires_at) VALUES (NULL, %s, %s, %s)",
+                (user_id, now, now + TOKEN_TTL))
+    cur.close()
+    revocations.add(user_id=user_id, not_before=now)
+
+
+# Incremental sync: list endpoints accept ?since=<sync_token> and then return only the rows
+# whose updated_at is at or after it, the ids deleted since (tombstones) and the
+# sync_token to send next time. Tombstones are kept for TOMBSTONE_RETENTION_DAYS; a since
+# older than that gets every row and "reset": true (see sync_since).
+SYNC_OVERLAP = float(os.getenv("SYNC_OVERLAP", "2")) # seconds
+TOMBSTONE_RETENTION_DAYS = float(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+TOMBSTONE_PURGE_INTERVAL = float(os.getenv("TOMBSTONE_PURGE_INTERVAL", "3600")) # seconds
+TOMBSTONE_PURGE_BATCH = 5000 # rows per DELETE, so a large purge doesn't hold locks for long
+SYNC_EPOCH = datetime(1970, 1, 1)
+
+def parse_since(value):
+    """?since= value (ISO 8601, e.g. a previous sync_token) -> naive datetime in database time (UTC)."""
+    since = datetime.fromisoformat(value)
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+def new_sync_token(conn):
+    # Read before the listing query. The overlap re-sends rows whose transaction was still
+    # open (updated_at set, not yet visible) when the listing ran.
+    cur = conn.cursor()
+    cur.execute("SELECT NOW(6)")
+    now = cur.fetchone()[0]
+    cur.close()
+    return (now - timedelta(seconds=SYNC_OVERLAP)).isoformat()
+
+def _tombstone_cutoff():
+    # Purging and sync_since() use the same clock, so a since the purge may have
+    # passed is never answered with a delta
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+
+def sync_since(since):
+    """(since to filter on, reset) for a parsed ?since=. Deletions older than the tombstone
+    retention are forgotten, so an older since lists every row (filtering from SYNC_EPOCH)
+    with reset=True: the client must replace its copy rather than apply a delta."""
+    if since < _tombstone_cutoff():
+        return SYNC_EPOCH, True
+    return since, False
+
+def deleted_since(conn, entity, since):
+    cur = conn.cursor()
+    cur.execute("SELECT entity_id FROM tombstones WHERE entity=%s AND deleted_at >= %s", (entity, since))
+    ids = sorted({row[0] for row in cur.fetchall()})
+    cur.close()
+    return ids
+
+def purge_tombstones(conn, entity):
+    """Delete entity's tombstones that are past the retention window; returns how many."""
+    cutoff = _tombstone_cutoff()
+    cur = conn.cursor()
+    purged = 0
+    while True:
+        cur.execute("DELETE FROM tombstones WHERE entity=%s AND deleted_at < %s LIMIT %s",
+                    (entity, cutoff, TOMBSTONE_PURGE_BATCH))
+        purged += cur.rowcount
+        if not conn.autocommit:
+            conn.commit()
+        if cur.rowcount < TOMBSTONE_PURGE_BATCH:
+            break
+    cur.close()
+    return purged
+
+def start_tombstone_purge(service_name, entity):
+    """Purge entity's expired tombstones now and every TOMBSTONE_PURGE_INTERVAL seconds."""
+    def _loop():
+        while True:
+            conn = None
+            try:
+                conn = background_connection()
+                purged = purge_tombstones(conn, entity)
+                if purged:
+                    print(f"{service_name}: purged {purged} {entity} tombstones older than {TOMBSTONE_RETENTION_DAYS:g} days")
+            except Exception as e:
+                print(f"{service_name}: could not purge {entity} tombstones ({e})")
+            finally:
+                if conn is not None:
+                    conn.close()
+            time.sleep(TOMBSTONE_PURGE_INTERVAL)
+    threading.Thread(target=_loop, name="tombstone-purge", daemon=True).start()
+
+# Conditional GET for listings: every write bumps its tables' counters in table_versions
+# and a listing's ETag hashes the counters of the tables it reads with the URL and the
+# caller, so If-None-Match is answered with one primary-key lookup, before any joins.
+def bump_versions(conn, *tables):
+    cur = conn.cursor()
+    cur.execute(f"UPDATE table_versions SET version = version + 1 WHERE name IN ({','.join(['%s'] * len(tables))})", tables)
+    cur.close()
+
+def listing_etag(conn, handler, tables, extra=""):
+    """ETag of a listing that reads `tables`; `extra` adds anything else its content depends on."""
+    cur = conn.cursor()
+    cur.execute(f"SELECT name, version FROM table_versions WHERE name IN ({','.join(['%s'] * len(tables))})", tuple(tables))
+    versions = dict(cur.fetchall())
+    cur.close()
+    return _make_etag(handler, tables, versions, extra)
+
+def _make_etag(handler, tables, versions, extra=""):
+    # Weak: the same listing may go out gzip-, brotli- or un-compressed
+    key = "|".join([handler.path, handler.headers.get("X-User-Id") or "", handler.headers.get("X-User-Role") or ""]
+                   + [f"{table}={versions.get(table, 0)}" for table in tables] + [extra])
+    return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+
+# JSON responses. DB rows carry datetime/date (and possibly Decimal) cells; orjson encodes
+# datetimes and dates natively as ISO 8601, so only rarer types (Decimal) reach the
+# per-type fallback. It is required: the stdlib encoder has to call back into Python for
+# every datetime cell and came out slower than the json.dumps(default=str) it replaced.
+_JSON_ENCODERS = {datetime: datetime.isoformat, date: date.isoformat, Decimal: str}
+
+def _json_default(value):
+    return _JSON_ENCODERS.get(type(value), str)(value)
+
+def json_bytes(payload):
+    """Serializes a response payload to UTF-8 JSON."""
+    return orjson.dumps(payload, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+
+# Response compression: _set_headers() buffers the body the handler writes after it and
+# _finish_response() sends it when the request is done, with Content-Length, and gzip/brotli
+# compressed (whichever the client's Accept-Encoding prefers) once it reaches COMPRESS_MIN_SIZE.
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024")) # bytes; smaller bodies aren't worth it
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5 # good ratio at a CPU cost close to gzip's for per-request compression
+
+def choose_encoding(accept_encoding):
+    """Returns "br", "gzip" or None (identity) for an Accept-Encoding header value."""
+    offered = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            offered[coding.lower()] = q
+    best, best_q = None, 0.0
+    # On equal q-values brotli wins: it compresses JSON noticeably better
+    for coding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        q = offered.get(coding, offered.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+def stream_compressor(encoding):
+    """(compress, finish) functions for a body that is compressed as it is written."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) # wbits=31: gzip framing
+    return compressor.compress, compressor.flush
+
+
+# Prometheus metrics, served in the text exposition format on GET /metrics.
+# Counters and histograms are kept in-process per label set; metrics registered
+# with read= are computed when scraped instead (pool sizes, existing counters).
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_MAX_ROUTES = 200 # distinct route labels; anything past that is reported as "other"
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}    # name -> (type, help, label names, read callable or None)
+        self._values = {}  # name -> {label values: number, or bucket counts + [sum] for histograms}
+        self._routes = set()
+
+    def register(self, kind, name, help_text, labels=(), read=None):
+        self._meta[name] = (kind, help_text, tuple(labels), read)
+        # Unlabelled counters and gauges start at 0 so they show up before their first change
+        self._values[name] = {(): 0} if not labels and kind != "histogram" else {}
+
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            values = self._values[name]
+            values[labels] = values.get(labels, 0) + amount
+
+    def observe(self, name, labels, seconds):
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            series = self._values[name].get(labels)
+            if series is None:
+                series = self._values[name][labels] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            series[bucket] += 1
+            series[-1] += seconds
+
+    def route(self, path):
+        """Low-cardinality route label: numeric path segments become {id}."""
+        label = "/".join("{id}" if part.isdigit() else part for part in path.split("?", 1)[0].split("/"))
+        if label.startswith("/files/"):
+            label = "/files/{name}"
+        with self._lock:
+            if label not in self._routes:
+                if len(self._routes) >= METRICS_MAX_ROUTES:
+                    return "other"
+                self._routes.add(label)
+        return label
+
+    def render(self):
+        with self._lock:
+            snapshot = {name: {labels: list(value) if isinstance(value, list) else value
+                               for labels, value in values.items()}
+                        for name, values in self._values.items()}
+        lines = []
+        for name, (kind, help_text, label_names, read) in self._meta.items():
+            series = snapshot[name]
+            if read is not None:
+                try:
+                    series = read()
+                except Exception as e:
+                    print(f"Metrics: reading {name} failed: {e}")
+                    continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(series.items(), key=lambda item: tuple(map(str, item[0]))):
+                if kind != "histogram":
+                    lines.append(f"{name}{_label_text(label_names, labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), value):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_label_text(label_names + ('le',), labels + (le,))} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(label_names, labels)} {value[-1]}")
+                lines.append(f"{name}_count{_label_text(label_names, labels)} {cumulative}")
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# Registered by every service; each main.py adds its own pool and cache metrics
+metrics = Metrics()
+metrics.register("counter", "http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+metrics.register("histogram", "http_request_duration_seconds", "Time from reading the request line to sending the response.", ("method", "route", "status"))
+metrics.register("gauge", "http_requests_in_flight", "Requests being handled right now.")
+metrics.register("histogram", "db_query_duration_seconds", "Time spent in cursor execute()/executemany().", ("operation", "table"))
+metrics.register("counter", "db_fetch_seconds_total", "Time spent fetching result rows after execute().", ("operation", "table"))
+metrics.register("counter", "db_errors_total", "Statements that raised.", ("operation", "table"))
+metrics.register("gauge", "db_pool_in_use", "Database connections checked out of the pool.")
+metrics.register("counter", "db_pool_exhausted_total", "Checkouts that failed because the pool was empty.")
+metrics.register("histogram", "upstream_request_duration_seconds", "Calls to other PMS services, retries included.", ("service", "outcome"))
+metrics.register("counter", "upstream_errors_total", "Failed attempts calling other PMS services.", ("service", "reason"))
+
+_SQL_TARGET = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)", re.IGNORECASE)
+
+def sql_labels(query):
+    """(operation, table) labels for a statement, e.g. ("select", "tasks")."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    words = query.split(None, 1)
+    target = _SQL_TARGET.search(query)
+    return (words[0].lower() if words else "", target.group(1).lower() if target else "")
+
+def record_request(handler):
+    """Count and time a finished request (called from handle_one_request)."""
+    started = getattr(handler, "_started", None)
+    if started is None:
+        return # the connection closed before a request line arrived
+    handler._started = None
+    metrics.inc("http_requests_in_flight", amount=-1)
+    status = handler._status
+    labels = (handler.command or "-", metrics.route(handler.path or ""), str(status) if status else "none")
+    metrics.inc("http_requests_total", labels)
+    metrics.observe("http_request_duration_seconds", labels, time.perf_counter() - started)
+
+
+class InstrumentedCursor:
+    """Cursor proxy that reports statement and fetch times to metrics."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._labels = ("", "")
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, method, query, args, kwargs):
+        self._labels = sql_labels(query)
+        started = time.perf_counter()
+        try:
+            return method(query, *args, **kwargs)
+        except Exception:
+            metrics.inc("db_errors_total", self._labels)
+            raise
+        finally:
+            metrics.observe("db_query_duration_seconds", self._labels, time.perf_counter() - started)
+
+    def execute(self, query, *args, **kwargs):
+        return self._timed(self._cursor.execute, query, args, kwargs)
+
+    def executemany(self, query, *args, **kwargs):
+        return self._timed(self._cursor.executemany, query, args, kwargs)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            metrics.inc("db_fetch_seconds_total", self._labels, time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+
+class InstrumentedConnection:
+    """Pooled connection proxy: its cursors are timed and it counts as in use until closed."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._released = False
+        metrics.inc("db_pool_in_use")
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            metrics.inc("db_pool_in_use", amount=-1)
+        self._conn.close()
+
+
+# ?token= (GET /events) as it appears in a logged request line
+_TOKEN_QUERY_PARAM = re.compile(r"([?&]token=)[^&\s]*")
+# How long a kept-alive connection may sit idle between requests; it holds a
+# server worker all that time
+KEEPALIVE_TIMEOUT = float(os.getenv("KEEPALIVE_TIMEOUT", "5")) # seconds
+
+
+class _RequestBody:
+    """The connection's rfile as seen by one request's handler: counts the body bytes it reads."""
+
+    def __init__(self, rfile):
+        self._rfile = rfile
+        self.consumed = 0
+
+    def read(self, size=-1):
+        data = self._rfile.read(size)
+        self.consumed += len(data)
+        return data
+
+    def readline(self, size=-1):
+        line = self._rfile.readline(size)
+        self.consumed += len(line)
+        return line
+
+    def __getattr__(self, name):
+        return getattr(self._rfile, name)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Request handling every service shares: buffered and compressed JSON responses,
+    conditional GET, token authentication and request metrics."""
+
+    # Keep-alive: every buffered response has a Content-Length, and the ones that
+    # don't (event streams, exports) close the connection
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    # Paths served without a token (monitoring; user-service adds /login and /signup)
+    token_exempt_paths = ("/health", "/metrics")
+    # Path prefixes served without a token (task-service: /files/, which browsers load directly)
+    token_exempt_prefixes = ()
+
+    def _set_headers(self, status=200, content_type="application/json", etag=None):
+        if getattr(self, "_response_body", None) is not None:
+            # The handler is replacing a response it already started (e.g. an error
+            # after a partial write): drop the buffered one
+            self._headers_buffer = []
+            self.wfile = self._raw_wfile
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        # include DELETE so browsers can preflight and allow DELETE requests from the frontend
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization, X-User-Role, X-User-Id")
+        if etag:
+            # Browsers revalidate with If-None-Match on every use instead of re-downloading
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "private, no-cache")
+            self.send_header("Access-Control-Expose-Headers", "ETag")
+        # The body written next is buffered and sent by _finish_response()
+        self._raw_wfile = self.wfile
+        self._response_body = self.wfile = io.BytesIO()
+
+    def _not_modified(self, etag):
+        """Sends 304 and returns True when the request's If-None-Match matches etag."""
+        if_none_match = self.headers.get("If-None-Match")
+        if not if_none_match:
+            return False
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" not in tags and etag.removeprefix("W/") not in tags:
+            return False
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "private, no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", "ETag")
+        self.end_headers()
+        return True
+
+    def _finish_response(self):
+        body_buffer = getattr(self, "_response_body", None)
+        if body_buffer is None:
+            return
+        self._response_body = None
+        self.wfile = self._raw_wfile
+        body = body_buffer.getvalue()
+        if self._status in (204, 304):
+            # These responses have no body, and RFC 9110 forbids Content-Length on a 204
+            if self.close_connection:
+                self.send_header("Connection", "close")
+            self.end_headers()
+            return
+        encoding = choose_encoding(self.headers.get("Accept-Encoding")) if len(body) >= COMPRESS_MIN_SIZE else None
+        if encoding:
+            body = compress_body(body, encoding)
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def request_scope(self):
+        """Context each request is handled in; task-service checks out its DB connection here."""
+        return nullcontext()
+
+    def setup(self):
+        super().setup()
+        self._connection_rfile = self.rfile
+
+    def handle_one_request(self):
+        self.rfile = self._connection_rfile
+        self.connection.settimeout(KEEPALIVE_TIMEOUT)
+        try:
+            # Wait for the next request without logging the idle timeout as an error
+            if not self.rfile.peek(1):
+                self.close_connection = True
+                return
+        except (TimeoutError, OSError):
+            self.close_connection = True
+            return
+        try:
+            with self.request_scope():
+                super().handle_one_request()
+        finally:
+            if self._body_left_unread():
+                # Whatever the handler didn't read would be parsed as the next request
+                self.close_connection = True
+            # Sent after request_scope() has closed, so slow clients don't hold what it holds
+            self._finish_response()
+            record_request(self)
+
+    def _body_left_unread(self):
+        if not isinstance(self.rfile, _RequestBody):
+            return False # no request got as far as its body
+        if "Transfer-Encoding" in self.headers:
+            return True # chunked bodies are never read
+        try:
+            return self.rfile.consumed < int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            return True
+
+    def do_OPTIONS(self):
+        # CORS preflight
+        self._set_headers(200)
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def log_message(self, format, *args):
+        # The request line may carry a token as ?token=; keep it out of the access log
+        super().log_message(format, *(_TOKEN_QUERY_PARAM.sub(r"\1<redacted>", arg) if isinstance(arg, str) else arg
+                                      for arg in args))
+
+    def request_token(self):
+        """The bearer token the request authenticates with, or None."""
+        auth = self.headers.get("Authorization", "")
+        return auth[len("Bearer "):] if auth.startswith("Bearer ") else None
+
+    def parse_request(self):
+        # The request line is in: time the request from here (see record_request)
+        self._started = time.perf_counter()
+        self._status = None
+        metrics.inc("http_requests_in_flight")
+        if not super().parse_request():
+            return False
+        # Headers are in; handlers read the body and write the response without a deadline
+        self.connection.settimeout(None)
+        self.rfile = _RequestBody(self._connection_rfile)
+        path = self.path.split("?", 1)[0]
+        if self.command == "OPTIONS" or path in self.token_exempt_paths or path.startswith(self.token_exempt_prefixes):
+            # Served to anyone, so identity headers mean nothing here
+            del self.headers["X-User-Id"]
+            del self.headers["X-User-Role"]
+            return True
+        if is_internal_call(self.headers):
+            return True
+        # Everyone else needs a signed token; its claims replace X-User-Id / X-User-Role so
+        # they cannot be spoofed
+        token = self.request_token()
+        claims = verify_token(token) if token else None
+        if claims is None:
+            self.close_connection = True
+            self._set_headers(401)
+            self.wfile.write(json_bytes({"error": "Invalid or expired token" if token else "Authentication required"}))
+            return False
+        del self.headers["X-User-Id"]
+        del self.headers["X-User-Role"]
+        self.headers["X-User-Id"] = str(claims["sub"])
+        self.headers["X-User-Role"] = claims["role"]
+        return True
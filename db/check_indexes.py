@@ -0,0 +1,74 @@
+"""EXPLAIN-based check that the hot queries use the indexes from db/migrations.
+
+Connects with the same DB_* environment variables as the services, runs EXPLAIN
+on the queries behind GET /tasks, the embedded comments/attachments and login,
+and exits non-zero when one of them is not using the expected index:
+
+    DB_HOST=localhost DB_USER=pms DB_PASS=pms python db/check_indexes.py
+
+Run it against a database with realistic data: on a handful of seed rows MySQL
+may legitimately prefer a full scan.
+"""
+import os
+import sys
+
+import mysql.connector
+
+# (description, query, params, indexes that are acceptable for it)
+HOT_QUERIES = [
+    ("tasks page",
+     "SELECT t.* FROM tasks t ORDER BY t.created_at DESC, t.id DESC LIMIT 51",
+     (), {"idx_tasks_created"}),
+    ("tasks by team",
+     "SELECT t.* FROM tasks t WHERE t.team_id IN (%s) ORDER BY t.created_at DESC, t.id DESC LIMIT 51",
+     (1,), {"idx_tasks_team_created"}),
+    ("tasks assigned to user",
+     "SELECT t.* FROM tasks t WHERE t.assigned_to IN (%s) ORDER BY t.created_at DESC, t.id DESC LIMIT 51",
+     (1,), {"idx_tasks_assigned_created"}),
+    ("tasks by status",
+     "SELECT t.* FROM tasks t WHERE t.status IN (%s) ORDER BY t.created_at DESC, t.id DESC LIMIT 51",
+     ("TODO",), {"idx_tasks_status_created"}),
+    ("task stats by team",
+     "SELECT t.team_id, t.assigned_to, t.status, t.priority, COUNT(*) FROM tasks t WHERE t.team_id IN (%s) "
+     "GROUP BY t.team_id, t.assigned_to, t.status, t.priority",
+     (1,), {"idx_tasks_team_stats"}),
+    ("task stats by assignee",
+     "SELECT t.team_id, t.assigned_to, t.status, t.priority, COUNT(*) FROM tasks t WHERE t.assigned_to = %s "
+     "GROUP BY t.team_id, t.assigned_to, t.status, t.priority",
+     (1,), {"idx_tasks_assigned_stats"}),
+    ("comments for tasks",
+     "SELECT c.* FROM comments c WHERE c.task_id IN (%s, %s) ORDER BY c.created_at ASC",
+     (1, 2), {"idx_comments_task_created"}),
+    ("attachments for tasks",
+     "SELECT a.* FROM attachments a WHERE a.task_id IN (%s, %s) ORDER BY a.created_at ASC",
+     (1, 2), {"idx_attachments_task_created"}),
+    ("login",
+     "SELECT id FROM users WHERE username=%s AND password=%s AND active=1",
+     ("admin", "admin"), {"idx_users_login", "username"}),
+]
+
+
+def main():
+    conn = mysql.connector.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASS", ""),
+        database=os.getenv("DB_NAME", "pms"),
+    )
+    cur = conn.cursor(dictionary=True)
+    failures = 0
+    for name, query, params, expected in HOT_QUERIES:
+        cur.execute("EXPLAIN " + query, params)
+        plan = cur.fetchall()
+        used = plan[0].get("key") if plan else None
+        ok = used in expected
+        failures += 0 if ok else 1
+        print(f"[{'ok' if ok else 'FAIL'}] {name}: key={used} type={plan[0].get('type') if plan else None} "
+              f"rows={plan[0].get('rows') if plan else None} (expected one of {sorted(expected)})")
+    cur.close()
+    conn.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
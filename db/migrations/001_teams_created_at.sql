@@ -0,0 +1,4 @@
+-- teams.created_at was added after the first deployments; databases created
+-- from an older init.sql are missing it. On newer ones the column already
+-- exists and the duplicate-column error is ignored by the runner.
+ALTER TABLE teams ADD COLUMN created_at DATETIME DEFAULT CURRENT_TIMESTAMP;
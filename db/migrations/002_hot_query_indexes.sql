@@ -0,0 +1,19 @@
+-- Composite indexes for the hot read paths.
+-- InnoDB appends the primary key to every secondary index, so (x, created_at)
+-- also serves the keyset ORDER BY created_at DESC, id DESC used by GET /tasks.
+
+-- GET /tasks (unfiltered pagination)
+CREATE INDEX idx_tasks_created ON tasks (created_at);
+-- GET /tasks?teamId=
+CREATE INDEX idx_tasks_team_created ON tasks (team_id, created_at);
+-- GET /tasks?mine=1 / assignedTo=
+CREATE INDEX idx_tasks_assigned_created ON tasks (assigned_to, created_at);
+-- GET /tasks?status=
+CREATE INDEX idx_tasks_status_created ON tasks (status, created_at);
+
+-- comments / attachments embedded in every task listing
+CREATE INDEX idx_comments_task_created ON comments (task_id, created_at);
+CREATE INDEX idx_attachments_task_created ON attachments (task_id, created_at);
+
+-- user-service handle_login
+CREATE INDEX idx_users_login ON users (username, password, active);
@@ -0,0 +1,30 @@
+-- Team membership moves from the JSON list in teams.members to an indexed
+-- join table. The primary key serves "members of team X", the secondary
+-- index serves "teams user Y belongs to".
+CREATE TABLE IF NOT EXISTS team_members (
+  team_id INT NOT NULL,
+  user_id INT NOT NULL,
+  PRIMARY KEY (team_id, user_id),
+  KEY idx_team_members_user (user_id, team_id),
+  FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE CASCADE,
+  FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Backfill from the JSON lists written by team-service (ids that no longer
+-- exist in users are dropped). DDL commits on its own, so this may be re-run
+-- after a partial attempt: the copy only runs while teams.members exists, and
+-- INSERT IGNORE makes a repeated copy harmless.
+SET @backfill_sql = IF(
+  EXISTS (SELECT 1 FROM information_schema.COLUMNS
+          WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'teams' AND COLUMN_NAME = 'members'),
+  'INSERT IGNORE INTO team_members (team_id, user_id)
+   SELECT t.id, j.user_id
+   FROM teams t
+   JOIN JSON_TABLE(IF(JSON_VALID(t.members), t.members, ''[]''), ''$[*]'' COLUMNS (user_id INT PATH ''$'')) j
+   JOIN users u ON u.id = j.user_id',
+  'DO 0');
+PREPARE backfill_stmt FROM @backfill_sql;
+EXECUTE backfill_stmt;
+DEALLOCATE PREPARE backfill_stmt;
+
+-- teams.members itself is dropped by 010, once this copy has been recorded.
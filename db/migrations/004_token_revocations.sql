@@ -0,0 +1,14 @@
+-- Revoked access tokens. Services keep an in-memory copy refreshed every few
+-- seconds, so checking a token never costs a query.
+--   jti set      -> that single token is revoked (logout)
+--   jti NULL     -> every token of user_id issued before not_before is revoked
+--                   (role change, deactivation, deletion)
+-- Times are epoch seconds; rows can be purged once expires_at has passed.
+CREATE TABLE IF NOT EXISTS token_revocations (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  jti VARCHAR(64),
+  user_id INT,
+  not_before DOUBLE NOT NULL,
+  expires_at DOUBLE NOT NULL,
+  KEY idx_token_revocations_expires (expires_at)
+);
@@ -0,0 +1,8 @@
+-- Content-addressed attachments: files are stored as <sha256><ext> and shared by
+-- every attachment row with the same bytes. The rows themselves are the reference
+-- count (counted through idx_attachments_hash), so ON DELETE CASCADE from tasks
+-- keeps it exact; task-service deletes a file once nothing references it.
+-- Rows uploaded before this migration keep content_hash NULL and own their file.
+ALTER TABLE attachments ADD COLUMN content_hash CHAR(64) NULL;
+ALTER TABLE attachments ADD COLUMN size BIGINT NULL;
+CREATE INDEX idx_attachments_hash ON attachments (content_hash);
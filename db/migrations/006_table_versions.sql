@@ -0,0 +1,8 @@
+-- Per-table change counters behind the ETags of the list endpoints. Every write path
+-- bumps the counters of the tables it touches (bump_versions in each service) after
+-- writing, so a validator can be computed with one primary-key lookup.
+CREATE TABLE IF NOT EXISTS table_versions (
+  name VARCHAR(64) PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0
+);
+INSERT IGNORE INTO table_versions (name) VALUES ('users'), ('teams'), ('tasks'), ('comments'), ('attachments');
@@ -0,0 +1,25 @@
+-- Incremental sync (?since= on the list endpoints). updated_at is maintained by
+-- MySQL on every UPDATE; writes that change a row's embedded data without
+-- updating the row itself (team membership, new comments/attachments on a task)
+-- touch it explicitly. Deletions leave a tombstone so clients can drop them.
+ALTER TABLE users ADD COLUMN updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE teams ADD COLUMN updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE tasks ADD COLUMN updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE comments ADD COLUMN updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+-- Existing rows: last change unknown, creation time is the best guess
+UPDATE teams SET updated_at = created_at WHERE created_at IS NOT NULL;
+UPDATE tasks SET updated_at = created_at WHERE created_at IS NOT NULL;
+UPDATE comments SET updated_at = created_at WHERE created_at IS NOT NULL;
+
+CREATE INDEX idx_users_updated ON users (updated_at);
+CREATE INDEX idx_teams_updated ON teams (updated_at);
+CREATE INDEX idx_tasks_updated ON tasks (updated_at);
+
+CREATE TABLE IF NOT EXISTS tombstones (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  entity VARCHAR(16) NOT NULL,
+  entity_id INT NOT NULL,
+  deleted_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  KEY idx_tombstones_entity_deleted (entity, deleted_at)
+);
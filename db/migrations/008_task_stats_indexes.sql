@@ -0,0 +1,6 @@
+-- Covering indexes for GET /tasks/stats: its GROUP BY over team, assignee,
+-- status and priority (plus due_date for the overdue count) is answered from
+-- the index alone, for the unscoped view, per team (teamId=, mine=team) and
+-- per assignee (mine=1, assignedTo=).
+CREATE INDEX idx_tasks_team_stats ON tasks (team_id, assigned_to, status, priority, due_date);
+CREATE INDEX idx_tasks_assigned_stats ON tasks (assigned_to, team_id, status, priority, due_date);
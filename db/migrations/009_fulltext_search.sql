@@ -0,0 +1,5 @@
+-- Full-text indexes behind GET /tasks/search. The first FULLTEXT index on an
+-- InnoDB table rebuilds it (to add the hidden FTS_DOC_ID column), so expect
+-- this migration to take a while on a large tasks/comments table.
+CREATE FULLTEXT INDEX ft_tasks_text ON tasks (title, description);
+CREATE FULLTEXT INDEX ft_comments_content ON comments (content);
@@ -0,0 +1,11 @@
+-- Second half of 003: drop the JSON membership list now that team_members has
+-- been filled from it. The DROP commits on its own, so it runs in a migration
+-- of its own, and only if the column is still there.
+SET @drop_sql = IF(
+  EXISTS (SELECT 1 FROM information_schema.COLUMNS
+          WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'teams' AND COLUMN_NAME = 'members'),
+  'ALTER TABLE teams DROP COLUMN members',
+  'DO 0');
+PREPARE drop_stmt FROM @drop_sql;
+EXECUTE drop_stmt;
+DEALLOCATE PREPARE drop_stmt;
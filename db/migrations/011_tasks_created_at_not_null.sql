@@ -0,0 +1,6 @@
+-- GET /tasks pages on (created_at, id), and a NULL created_at made a cursor that
+-- matches no row, ending the listing early. Rows without one sort last, as the
+-- oldest; the column can't be NULL from here on, so the indexes from 002 keep
+-- serving the keyset order.
+UPDATE tasks SET created_at = '1970-01-01 00:00:00' WHERE created_at IS NULL;
+ALTER TABLE tasks MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
@@ -65,6 +65,12 @@ async function apiRequest(baseUrl, path, method = "GET", body = null, token = nu
       data = {};
     }
 
+    // Expired or revoked session token: send the user back to the login page
+    if (res.status === 401 && authToken && path !== "/login" && path !== "/logout") {
+      localStorage.clear();
+      window.location.href = "index.html";
+    }
+
     if (!res.ok) {
       throw data;
     }
@@ -76,6 +82,54 @@ async function apiRequest(baseUrl, path, method = "GET", body = null, token = nu
   }
 }
 
+// Walk a cursor-paginated endpoint ({ tasks, next_cursor }) and return all items.
+// Each request stays small on the server; the pages are concatenated here.
+async function fetchAllPages(baseUrl, path, pageSize = 200) {
+  const sep = path.includes("?") ? "&" : "?";
+  let items = [];
+  let cursor = null;
+  do {
+    let pagePath = `${path}${sep}limit=${pageSize}`;
+    if (cursor) pagePath += `&cursor=${encodeURIComponent(cursor)}`;
+    const page = await apiRequest(baseUrl, pagePath);
+    items = items.concat(page.tasks || []);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return items;
+}
+
+// Listen to task-service's event stream (GET /events) and call onChange once
+// per burst of events. EventSource can't send headers, so the token goes in the
+// query string; the browser reconnects on its own after network errors.
+function subscribeTaskEvents(query, onChange, delayMs = 500) {
+  const token = localStorage.getItem("token");
+  if (!token || typeof EventSource === "undefined") return null;
+  const sep = query ? "&" : "";
+  const source = new EventSource(`${TASK_SERVICE_URL}/events?${query}${sep}token=${encodeURIComponent(token)}`);
+  let timer = null;
+  const schedule = () => {
+    clearTimeout(timer);
+    timer = setTimeout(onChange, delayMs);
+  };
+  ["task.created", "task.updated", "task.deleted", "comment.created", "attachment.created"].forEach(type =>
+    source.addEventListener(type, schedule)
+  );
+  return source;
+}
+
+// Revoke the current token on user-service, then drop the local session
+async function endSession() {
+  try {
+    if (localStorage.getItem("token")) {
+      await apiRequest(USER_SERVICE_URL, "/logout", "POST");
+    }
+  } catch (e) {
+    // the token is discarded locally either way
+  }
+  localStorage.clear();
+  window.location.href = "index.html";
+}
+
 function showToast(message, isError = false) {
     const toastContainer = document.querySelector('.toast-container');
     if (!toastContainer) {
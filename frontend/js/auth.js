@@ -72,8 +72,7 @@ if (signupForm) {
 document.addEventListener("click", (e) => {
   if (e.target.matches("#logout-link") || e.target.closest("#logout-link")) {
     e.preventDefault();
-    console.log("Logout clicked - clearing localStorage");
-    localStorage.clear();
-    window.location.href = "index.html";
+    console.log("Logout clicked - revoking token and clearing localStorage");
+    endSession();
   }
 });
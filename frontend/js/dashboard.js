@@ -43,12 +43,16 @@ document.addEventListener("DOMContentLoaded", async () => {
       }
   }
 
-  function renderTasks(tasks) {
-    colTodo.innerHTML = "";
-    colInProgress.innerHTML = "";
-    colDone.innerHTML = "";
+  // Let task-service filter: members get their assigned tasks, leaders also get their teams' tasks
+  let scope = "";
+  if (currentUser.role === 'TEAM_LEADER') scope = "mine=team";
+  else if (currentUser.role !== 'ADMIN') scope = "mine=1";
 
-    let todo = 0, inProg = 0, done = 0;
+  // Cards shown per column; the counters above come from /tasks/stats and cover everything
+  const CARDS_PER_COLUMN = 20;
+
+  function renderColumn(column, tasks, total) {
+    column.innerHTML = "";
 
     tasks.forEach(task => {
       const priority = getPriorityClass(task.priority);
@@ -70,23 +74,25 @@ document.addEventListener("DOMContentLoaded", async () => {
           window.location.href = `task.html?id=${task.id}`;
       });
       card.style.cursor = 'pointer';
-
-      if (task.status === "TODO") {
-        colTodo.appendChild(card);
-        todo++;
-      } else if (task.status === "IN_PROGRESS") {
-        colInProgress.appendChild(card);
-        inProg++;
-      } else if (task.status === "DONE") {
-        colDone.appendChild(card);
-        done++;
-      }
+      column.appendChild(card);
     });
 
-    statTotal.textContent = tasks.length;
+    if (total > tasks.length) {
+      const more = document.createElement("div");
+      more.className = "text-muted small text-center";
+      more.textContent = `+${total - tasks.length} more`;
+      column.appendChild(more);
+    }
+  }
+
+  function renderStats(stats) {
+    const { TODO: todo, IN_PROGRESS: inProg, DONE: done } = stats.by_status;
+    statTotal.textContent = stats.total;
     statTodo.textContent = todo;
     statInProgress.textContent = inProg;
     statDone.textContent = done;
+    if (statTeams) statTeams.textContent = stats.teams.mine;
+    if (statGlobalTeams) statGlobalTeams.textContent = stats.teams.total;
 
     renderChart(todo, inProg, done);
   }
@@ -128,57 +134,19 @@ document.addEventListener("DOMContentLoaded", async () => {
 
   async function loadDashboardData() {
     try {
-        console.log("CurrentUser:", currentUser);
-        const allTasks = await apiRequest(TASK_SERVICE_URL, "/tasks");
-        const teams = await apiRequest(TEAM_SERVICE_URL, '/teams'); // Visible teams for My Teams count
-        
-        let filteredTasks = [];
-        let myTeamsCount = 0;
-
-        // Set Global Teams Count
-        if (statGlobalTeams) {
-            try {
-                const countData = await apiRequest(TEAM_SERVICE_URL, '/teams/count');
-                statGlobalTeams.textContent = countData.count;
-            } catch (e) {
-                console.error("Failed to fetch global team count", e);
-                statGlobalTeams.textContent = '-';
-            }
-        }
-
-        // Calculate My Teams Count (for ALL roles, count only teams where user is leader or member)
-        myTeamsCount = teams.filter(t => {
-            const isLeader = t.leader_id == currentUser.id;
-            // parsing members again...
-            let members = [];
-            if (typeof t.members === 'string') members = t.members.split(',').map(Number);
-            else if (Array.isArray(t.members)) members = t.members.map(Number);
-            else if (typeof t.members === 'number') members = [t.members];
-            
-            const isMember = members.includes(currentUser.id);
-            return isLeader || isMember;
-        }).length;
-        
-        if(statTeams) statTeams.textContent = myTeamsCount;
-
-
-        if (currentUser.role === 'ADMIN') {
-            filteredTasks = allTasks;
-        } else if (currentUser.role === 'TEAM_LEADER') {
-            const myLedTeamIds = teams
-                .filter(t => t.leader_id == currentUser.id) 
-                .map(t => t.id);
-            
-            filteredTasks = allTasks.filter(task => {
-                const isAssigned = task.assigned_to == currentUser.id;
-                const isMyTeamTask = myLedTeamIds.includes(task.team_id);
-                return isAssigned || isMyTeamTask;
-            });
-        } else {
-            filteredTasks = allTasks.filter(task => task.assigned_to == currentUser.id);
-        }
-        
-        renderTasks(filteredTasks);
+        // Counts come pre-aggregated; only the first page of each column is downloaded
+        const page = status => apiRequest(TASK_SERVICE_URL, `/tasks?${scope ? scope + "&" : ""}status=${status}&limit=${CARDS_PER_COLUMN}`);
+        const [stats, todoPage, inProgressPage, donePage] = await Promise.all([
+            apiRequest(TASK_SERVICE_URL, scope ? `/tasks/stats?${scope}` : "/tasks/stats"),
+            page("TODO"),
+            page("IN_PROGRESS"),
+            page("DONE"),
+        ]);
+
+        renderStats(stats);
+        renderColumn(colTodo, todoPage.tasks, stats.by_status.TODO);
+        renderColumn(colInProgress, inProgressPage.tasks, stats.by_status.IN_PROGRESS);
+        renderColumn(colDone, donePage.tasks, stats.by_status.DONE);
 
     } catch (err) {
         console.error("Failed to load dashboard data:", err);
@@ -187,4 +155,5 @@ document.addEventListener("DOMContentLoaded", async () => {
   }
 
   loadDashboardData();
+  subscribeTaskEvents(scope, loadDashboardData);
 });
\ No newline at end of file
@@ -17,6 +17,5 @@ function requireAuth() {
 }
 
 function logout() {
-  localStorage.clear();
-  window.location.href = "index.html";
+  endSession();
 }
@@ -430,9 +430,13 @@ document.addEventListener('DOMContentLoaded', async () => {
             attachments.forEach(a => {
                 // Construct URL carefully, assuming backend serves files from /files/
                 const fileUrl = a.url.startsWith('/') ? `${TASK_SERVICE_URL}${a.url}` : a.url;
+                // Images get a small server-rendered thumbnail instead of loading the original
+                const icon = /\.(jpe?g|png|gif|webp|bmp)$/i.test(a.url)
+                    ? `<img src="${fileUrl}?size=thumb" alt="" loading="lazy" class="me-2 rounded" style="max-width: 80px; max-height: 80px;">`
+                    : '<i class="fas fa-paperclip me-2"></i>';
                 attachmentsHtml += `
                     <a href="${fileUrl}" target="_blank" class="list-group-item list-group-item-action">
-                        <i class="fas fa-paperclip me-2"></i> ${escapeHtml(a.original_name || 'Unnamed Attachment')}
+                        ${icon} ${escapeHtml(a.original_name || 'Unnamed Attachment')}
                     </a>
                 `;
             });
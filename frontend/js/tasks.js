@@ -20,6 +20,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const tasksListTbody = document.getElementById("tasks-list");
     const noTasksMessage = document.getElementById("no-tasks-message");
     const createTaskBtn = document.getElementById('create-task-btn');
+    const searchInput = document.getElementById('search-input');
+    const SEARCH_RESULTS = 50; // best matches shown for a search
 
     // Helper functions assumed to be available from api.js and session.js
     // const apiRequest = require('./api.js').apiRequest; // Example
@@ -137,10 +139,15 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    async function loadTasks() {
-        tasksListTbody.innerHTML = '<tr><td colspan="9" class="text-center"><div class="spinner-border spinner-border-sm" role="status"></div> Loading tasks...</td></tr>';
+    async function loadTasks(showSpinner = true) {
+        if (showSpinner) tasksListTbody.innerHTML = '<tr><td colspan="9" class="text-center"><div class="spinner-border spinner-border-sm" role="status"></div> Loading tasks...</td></tr>';
         try {
-            const tasks = await apiRequest(TASK_SERVICE_URL, "/tasks");
+            // Member sees ONLY tasks assigned to them; task-service does the filtering
+            // (and the ranking, when searching)
+            const query = searchInput ? searchInput.value.trim() : "";
+            const tasks = query
+                ? (await apiRequest(TASK_SERVICE_URL, `/tasks/search?mine=1&limit=${SEARCH_RESULTS}&q=${encodeURIComponent(query)}`)).tasks
+                : await fetchAllPages(TASK_SERVICE_URL, "/tasks?mine=1");
             
             // Enrich tasks with user and team details
             const userIds = new Set();
@@ -164,10 +171,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 });
             }
 
-            // Filter: Member sees ONLY tasks assigned to them
-            const myTasks = (tasks || []).filter(task => task.assigned_to == user.id);
-
-            renderTasks(myTasks);
+            renderTasks(tasks || []);
         } catch (err) {
             console.error("Failed to load tasks:", err);
             tasksListTbody.innerHTML = '<tr><td colspan="9" class="text-center text-danger">Failed to load tasks.</td></tr>';
@@ -201,8 +205,14 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    // Initial load
+    document.getElementById('search-form')?.addEventListener('submit', (e) => {
+        e.preventDefault();
+        loadTasks();
+    });
+
+    // Initial load, then refresh whenever one of the member's tasks changes
     loadTasks();
+    subscribeTaskEvents("mine=1", () => loadTasks(false));
 });
 
 // Placeholder definitions for required functions/variables
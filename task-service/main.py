@@ -1,23 +1,205 @@
+import csv
 import json
+import io
+import hmac
+import hashlib
 import os
-import cgi
-import uuid
-from http.server import BaseHTTPRequestHandler, HTTPServer
-from urllib.parse import urlparse, parse_qs
+import re
+import sys
+import tempfile
+import mimetypes
+import email.parser
+import email.utils
+import base64
+import collections
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from collections import OrderedDict
+from http.server import HTTPServer
+from urllib.parse import urlparse, parse_qs, quote, urlencode
 import mysql.connector.pooling
 import requests
-from datetime import datetime
+import requests.adapters
+try:
+    from PIL import Image, ImageOps
+except ImportError: # thumbnails are optional; /files/<name>?size= then falls back to the original
+    Image = ImageOps = None
+from datetime import datetime, date
+# The Dockerfile copies pms_common.py next to this file; in a checkout it lives in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+import pms_common
+from pms_common import (
+    _JSON_ENCODERS, INTERNAL_SECRET, INTERNAL_SECRET_HEADER, InstrumentedConnection, PooledHTTPServer, ServiceHandler,
+    apply_migrations, choose_encoding, is_internal_call, json_bytes, metrics, parse_since, revocations,
+    start_tombstone_purge, stream_compressor, sync_since,
+)
 
 USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://user-service:8080")
 TEAM_SERVICE_URL = os.getenv("TEAM_SERVICE_URL", "http://team-service:8081") # Assuming team service URL
 
+UPLOADS_DIR = os.path.join(os.path.dirname(__file__), 'uploads')
+# Rendered thumbnails/previews (see THUMBNAIL_SIZES); local to each replica
+THUMBNAILS_DIR = os.getenv("THUMBNAILS_DIR", os.path.join(UPLOADS_DIR, "thumbnails"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+# Where attachment files are kept: "local" (UPLOADS_DIR) or "s3" (any S3-compatible store, see make_storage)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(25 * 1024 * 1024)))  # bytes per attachment
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", "65536"))           # bytes read from the socket at a time
+MAX_FORM_FIELD_SIZE = 64 * 1024  # non-file form fields and part headers
+# Stored files get unique names and are never rewritten, so browsers may keep them for long
+FILES_CACHE_CONTROL = os.getenv("FILES_CACHE_CONTROL", "private, max-age=31536000, immutable")
+
+# Inter-service calls (user-service / team-service lookups)
+SERVICE_TIMEOUT = float(os.getenv("SERVICE_TIMEOUT", "2"))          # seconds, connect and read
+SERVICE_RETRIES = int(os.getenv("SERVICE_RETRIES", "2"))            # extra attempts on connection errors/5xx
+SERVICE_BACKOFF = float(os.getenv("SERVICE_BACKOFF", "0.1"))        # first retry delay, doubled each time
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))        # consecutive failures that open the circuit
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))             # seconds before a trial call is let through
+# In-process cache of user/team details fetched from the other services
+DETAILS_CACHE_SIZE = int(os.getenv("DETAILS_CACHE_SIZE", "10000"))  # entries per cache
+DETAILS_CACHE_TTL = float(os.getenv("DETAILS_CACHE_TTL", "60"))     # seconds
+
+# Page size used by GET /tasks when the client asks for pagination without an explicit limit
+DEFAULT_PAGE_SIZE = int(os.getenv("TASKS_DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("TASKS_MAX_PAGE_SIZE", "200"))
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500")) # items per /tasks/bulk request
+# GET /tasks/export and POST /tasks/import move rows in batches of this size, so
+# memory stays flat however many tasks there are
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_LINE = 1024 * 1024 # bytes per NDJSON/CSV line
+IMPORT_MAX_ERRORS = 100       # row errors listed in the import response (all are counted)
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASS", ""),
+    "database": os.getenv("DB_NAME", "pms"),
+    "autocommit": True,
+}
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+# Extra short-lived connections allowed when every pooled one is checked out
+DB_POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", "0"))
+
 # db_pool will be initialized in the run() function
 db_pool = None
+_overflow_slots = threading.BoundedSemaphore(DB_POOL_OVERFLOW) if DB_POOL_OVERFLOW > 0 else None
+
+
+class OverflowConnection:
+    """Plain connection opened past the pool size; closing it frees its overflow slot."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        try:
+            self._conn.close()
+        finally:
+            _overflow_slots.release()
+
 
 def get_db_conn():
     if db_pool is None:
         raise Exception("Database connection pool not initialized.")
-    return db_pool.get_connection()
+    try:
+        return InstrumentedConnection(db_pool.get_connection())
+    except mysql.connector.errors.PoolError:
+        if _overflow_slots is None or not _overflow_slots.acquire(blocking=False):
+            metrics.inc("db_pool_exhausted_total")
+            raise
+        try:
+            conn = OverflowConnection(mysql.connector.connect(**DB_CONFIG))
+        except Exception:
+            _overflow_slots.release()
+            raise
+        metrics.inc("db_pool_overflow_total")
+        return InstrumentedConnection(conn)
+
+
+# Unit of work: every request handled by TaskServiceHandler runs inside
+# request_connection(), so all execute_query calls it makes share a single
+# connection that is checked out on first use and returned when the request ends.
+_request_state = threading.local()
+
+@contextmanager
+def request_connection():
+    _request_state.active = True
+    _request_state.conn = None
+    _request_state.in_transaction = False
+    try:
+        yield
+    finally:
+        conn = _request_state.conn
+        in_transaction = _request_state.in_transaction
+        _request_state.active = False
+        _request_state.conn = None
+        _request_state.in_transaction = False
+        if conn is not None:
+            try:
+                if in_transaction:
+                    conn.rollback()
+            finally:
+                conn.close()
+
+def _request_conn():
+    if _request_state.conn is None:
+        _request_state.conn = get_db_conn()
+    return _request_state.conn
+
+@contextmanager
+def transaction():
+    """Run the enclosed execute_query calls as one transaction on the request's connection."""
+    if not getattr(_request_state, "active", False):
+        # Called outside a request (e.g. from a script): scope a connection just for this
+        with request_connection():
+            with transaction():
+                yield
+        return
+    if _request_state.in_transaction:
+        yield # nested: join the outer transaction
+        return
+    conn = _request_conn()
+    conn.start_transaction()
+    _request_state.in_transaction = True
+    try:
+        yield
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _request_state.in_transaction = False
+
+
+class StreamHandoffMixin:
+    """Leaves connections that a handler handed to event_hub open after it returns."""
+
+    def shutdown_request(self, request):
+        if event_hub.owns(request):
+            return
+        super().shutdown_request(request)
+
+
+class StreamingPooledHTTPServer(StreamHandoffMixin, PooledHTTPServer):
+    pass
+
+
+class SingleHTTPServer(StreamHandoffMixin, HTTPServer):
+    pass
+
+
+def make_server(server_address, handler_class, workers):
+    return pms_common.make_server(server_address, handler_class, workers,
+                                  pooled_class=StreamingPooledHTTPServer, single_class=SingleHTTPServer)
+
 
 # Helper function to parse request body
 def parse_request_body(handler):
@@ -27,16 +209,690 @@ def parse_request_body(handler):
         return json.loads(body.decode("utf-8"))
     except json.JSONDecodeError:
         handler._set_headers(400, "application/json")
-        handler.wfile.write(json.dumps({"error": "Invalid JSON payload"}).encode("utf-8"))
+        handler.wfile.write(json_bytes({"error": "Invalid JSON payload"}))
         return None
 
+# Streaming multipart/form-data parser for attachment uploads. The body is read in
+# UPLOAD_CHUNK_SIZE pieces and the file part goes straight to a temp file in UPLOADS_DIR,
+# so memory use stays flat whatever the upload size.
+class UploadTooLarge(Exception):
+    pass
+
+
+class MultipartError(ValueError):
+    pass
+
+
+class _FieldPart:
+    """Small form field (e.g. original_name), kept in memory."""
+
+    def __init__(self, fields, name):
+        self._fields = fields
+        self._name = name
+        self._data = bytearray()
+
+    def write(self, data):
+        self._data += data
+        if len(self._data) > MAX_FORM_FIELD_SIZE:
+            raise MultipartError(f"Form field '{self._name}' is too large")
+
+    def close(self):
+        if self._name:
+            self._fields[self._name] = self._data.decode("utf-8", "replace")
+
+
+class _FilePart:
+    """File part streamed to a temp file while its size and sha256 are tracked."""
+
+    def __init__(self, filename, dest_dir, max_bytes):
+        self.filename = filename
+        self.size = 0
+        self._max_bytes = max_bytes
+        self._hash = hashlib.sha256()
+        os.makedirs(dest_dir, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=dest_dir, prefix=".upload-", delete=False)
+        self.temp_path = self._file.name
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self._max_bytes:
+            raise UploadTooLarge()
+        self._hash.update(data)
+        self._file.write(data)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def discard(self):
+        self.close()
+        try:
+            os.unlink(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class _DiscardPart:
+    def write(self, data):
+        pass
+
+    def close(self):
+        pass
+
+
+def receive_multipart_upload(rfile, content_length, boundary, file_field="file",
+                             dest_dir=UPLOADS_DIR, max_bytes=None):
+    """Parses a multipart body of content_length bytes from rfile.
+
+    Returns (fields, upload): fields maps form field names to strings, upload is the
+    _FilePart for file_field (the caller stores its temp file, then discards it) or None.
+    Raises UploadTooLarge past max_bytes and MultipartError on a malformed body.
+    """
+    max_bytes = MAX_UPLOAD_SIZE if max_bytes is None else max_bytes
+    # Every delimiter, the first one included, is matched as CRLF "--" boundary
+    delimiter = b"\r\n--" + boundary
+    keep = len(delimiter) - 1
+    buf = bytearray(b"\r\n")
+    remaining = content_length
+    fields = {}
+    upload = None
+    part = None
+    state = "preamble"
+
+    def read_more():
+        nonlocal remaining
+        if remaining <= 0:
+            raise MultipartError("Multipart body ended before the closing boundary")
+        chunk = rfile.read(min(UPLOAD_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise MultipartError("Connection closed during upload")
+        remaining -= len(chunk)
+        buf.extend(chunk)
+
+    try:
+        while True:
+            if state in ("preamble", "body"):
+                idx = buf.find(delimiter)
+                if idx == -1:
+                    # Hold back a possible partial delimiter at the end of the buffer
+                    if len(buf) > keep:
+                        if part is not None:
+                            part.write(bytes(buf[:-keep]))
+                        del buf[:-keep]
+                    read_more()
+                    continue
+                if part is not None:
+                    part.write(bytes(buf[:idx]))
+                    part.close()
+                    part = None
+                del buf[:idx + len(delimiter)]
+                state = "delimiter"
+            elif state == "delimiter":
+                while len(buf) < 2:
+                    read_more()
+                if buf[:2] == b"--":
+                    break
+                idx = buf.find(b"\r\n")
+                if idx == -1:
+                    if len(buf) > 1024:
+                        raise MultipartError("Malformed multipart boundary line")
+                    read_more()
+                    continue
+                del buf[:idx + 2]
+                state = "headers"
+            elif state == "headers":
+                if buf[:2] == b"\r\n":
+                    raw_headers, end = b"", 2
+                else:
+                    idx = buf.find(b"\r\n\r\n")
+                    if idx == -1:
+                        if len(buf) > MAX_FORM_FIELD_SIZE:
+                            raise MultipartError("Multipart part headers are too large")
+                        read_more()
+                        continue
+                    raw_headers, end = bytes(buf[:idx]), idx + 4
+                del buf[:end]
+                headers = email.parser.BytesHeaderParser().parsebytes(raw_headers)
+                name = headers.get_param("name", header="content-disposition")
+                filename = headers.get_filename()
+                if filename is None:
+                    part = _FieldPart(fields, name)
+                elif name == file_field and upload is None and filename:
+                    upload = part = _FilePart(os.path.basename(filename.replace("\\", "/")), dest_dir, max_bytes)
+                else:
+                    part = _DiscardPart()
+                state = "body"
+
+        # Drain the epilogue so the connection is left at the next request
+        while remaining > 0:
+            chunk = rfile.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+    except BaseException:
+        if upload is not None:
+            upload.discard()
+        raise
+    if upload is not None:
+        upload.close()
+    return fields, upload
+
+# Attachment storage backends. Both store files under a flat name; handle_attachment_upload
+# and handle_file_serving only talk to the module-level `storage`.
+class LocalStorage:
+    """Files in a directory on local disk (the task_uploads volume)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def exists(self, name):
+        return os.path.isfile(self.path(name))
+
+    def put(self, src_path, name, size, sha256):
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            # Upload temp files live in UPLOADS_DIR: a hard link publishes the file atomically, no copy
+            os.link(src_path, self.path(name))
+        except FileExistsError:
+            pass
+
+    def delete(self, name):
+        try:
+            os.unlink(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def open(self, name):
+        return open(self.path(name), "rb")
+
+    def download_url(self, name):
+        return None # served by handle_file_serving itself
+
+
+class S3Storage:
+    """Objects in an S3-compatible bucket (AWS S3, MinIO, ...) using path-style URLs.
+
+    Requests are signed with AWS Signature Version 4. Downloads are answered with a
+    redirect to a presigned GET URL, so file bytes never pass through this service.
+    """
+    EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+    def __init__(self, endpoint, bucket, access_key, secret_key, region="us-east-1",
+                 public_endpoint=None, prefix="", presign_ttl=300, timeout=30):
+        self.endpoint = endpoint.rstrip("/")
+        # Presigned URLs are signed for the host the browser uses, which may differ from ours
+        self.public_endpoint = (public_endpoint or endpoint).rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix
+        self.presign_ttl = presign_ttl
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=10))
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=10))
+
+    def _path(self, name=None):
+        path = "/" + quote(self.bucket, safe="")
+        if name is not None:
+            path += "/" + quote(self.prefix + name, safe="/-_.~")
+        return path
+
+    def _signature(self, method, host, path, query, headers, payload_hash, amz_date):
+        """SigV4: returns (signed_headers, signature) for one request."""
+        scope = f"{amz_date[:8]}/{self.region}/s3/aws4_request"
+        all_headers = dict((k.lower(), str(v).strip()) for k, v in headers.items())
+        all_headers["host"] = host
+        signed_headers = ";".join(sorted(all_headers))
+        canonical_request = "\n".join([
+            method,
+            path,
+            "&".join(f"{quote(k, safe='-_.~')}={quote(str(v), safe='-_.~')}" for k, v in sorted(query.items())),
+            "".join(f"{k}:{all_headers[k]}\n" for k in sorted(all_headers)),
+            signed_headers,
+            payload_hash,
+        ])
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope,
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+        ])
+        key = ("AWS4" + self.secret_key).encode("utf-8")
+        for part in (amz_date[:8], self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+        return signed_headers, hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def _request(self, method, name=None, payload_hash=EMPTY_SHA256, data=None, headers=None):
+        amz_date = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        path = self._path(name)
+        amz_headers = {"x-amz-date": amz_date, "x-amz-content-sha256": payload_hash}
+        signed_headers, signature = self._signature(
+            method, urlparse(self.endpoint).netloc, path, {}, amz_headers, payload_hash, amz_date)
+        request_headers = dict(headers or {}, **amz_headers)
+        request_headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request, "
+            f"SignedHeaders={signed_headers}, Signature={signature}")
+        return self.session.request(method, self.endpoint + path, data=data, headers=request_headers,
+                                    timeout=self.timeout, stream=(method == "GET"))
+
+    def ensure_bucket(self):
+        resp = self._request("PUT")
+        if resp.status_code not in (200, 409): # 409: bucket already exists
+            resp.raise_for_status()
+
+    def exists(self, name):
+        resp = self._request("HEAD", name)
+        if resp.status_code == 404:
+            return False
+        resp.raise_for_status()
+        return True
+
+    def put(self, src_path, name, size, sha256):
+        # The content hash computed while streaming the upload doubles as the SigV4 payload hash
+        with open(src_path, "rb") as fh:
+            resp = self._request("PUT", name, payload_hash=sha256, data=fh, headers={
+                "Content-Length": str(size),
+                "Content-Type": mimetypes.guess_type(name)[0] or "application/octet-stream",
+            })
+        resp.raise_for_status()
+
+    def delete(self, name):
+        resp = self._request("DELETE", name)
+        if resp.status_code not in (204, 404):
+            resp.raise_for_status()
+
+    def open(self, name):
+        """Downloads the object into a local temp file (seekable, deleted on close)."""
+        resp = self._request("GET", name)
+        try:
+            resp.raise_for_status()
+            fh = tempfile.TemporaryFile()
+            for chunk in resp.iter_content(UPLOAD_CHUNK_SIZE):
+                fh.write(chunk)
+            fh.seek(0)
+            return fh
+        finally:
+            resp.close()
+
+    def download_url(self, name):
+        amz_date = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        path = self._path(name)
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(self.presign_ttl),
+            "X-Amz-SignedHeaders": "host",
+        }
+        _, signature = self._signature(
+            "GET", urlparse(self.public_endpoint).netloc, path, query, {}, "UNSIGNED-PAYLOAD", amz_date)
+        query["X-Amz-Signature"] = signature
+        return f"{self.public_endpoint}{path}?{urlencode(query)}"
+
+
+def make_storage():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(
+            os.getenv("S3_ENDPOINT", "http://minio:9000"),
+            os.getenv("S3_BUCKET", "pms-attachments"),
+            os.getenv("S3_ACCESS_KEY", ""),
+            os.getenv("S3_SECRET_KEY", ""),
+            region=os.getenv("S3_REGION", "us-east-1"),
+            public_endpoint=os.getenv("S3_PUBLIC_ENDPOINT"),
+            prefix=os.getenv("S3_PREFIX", ""),
+            presign_ttl=int(os.getenv("S3_PRESIGN_TTL", "300")),
+            timeout=float(os.getenv("S3_TIMEOUT", "30")),
+        )
+    return LocalStorage(UPLOADS_DIR)
+
+storage = make_storage()
+
+
+# Attachments are content addressed: a file is stored as <sha256><ext>, so the same
+# bytes uploaded to many tasks are written once. The attachments rows pointing at a
+# file are its reference count. blob_lock() (a MySQL named lock, so it holds across
+# task-service replicas) serialises inserting a row + checking its file against
+# counting references + deleting, so a file is never removed under a fresh upload.
+@contextmanager
+def blob_lock():
+    if not getattr(_request_state, "active", False):
+        # The named lock belongs to a connection: keep one for the whole block
+        with request_connection():
+            with blob_lock():
+                yield
+        return
+    got = execute_query("SELECT GET_LOCK('pms_attachment_blobs', 10)", fetch_one=True, dictionary=False)
+    if not got or got[0] != 1:
+        raise Exception("Timed out waiting for the attachment storage lock")
+    try:
+        yield
+    finally:
+        execute_query("SELECT RELEASE_LOCK('pms_attachment_blobs')", fetch_one=True, dictionary=False)
+
+def save_attachment(upload, task_id, author_id, original_name):
+    """Stores a finished upload under its content-addressed name and inserts its row.
+
+    Returns the new attachment id. The bytes are copied before taking the lock; under
+    it the object is checked again in case a concurrent collection just removed it.
+    """
+    name = f"{upload.sha256}{os.path.splitext(upload.filename)[1].lower()}"
+    url = f"/files/{name}"
+    if not storage.exists(name):
+        storage.put(upload.temp_path, name, upload.size, upload.sha256)
+    with blob_lock():
+        try:
+            inserted = execute_query(
+                "INSERT INTO attachments (task_id, author_id, url, original_name, content_hash, size) VALUES (%s, %s, %s, %s, %s, %s)",
+                (task_id, author_id, url, original_name, upload.sha256, upload.size)
+            )
+        except Exception:
+            # e.g. unknown task: drop the file again unless another row uses it
+            collect_attachment_files([(url, upload.sha256)])
+            raise
+        if not storage.exists(name):
+            storage.put(upload.temp_path, name, upload.size, upload.sha256)
+    # Tasks embed their attachments, so the task counts as changed for ?since= sync
+    execute_query("UPDATE tasks SET updated_at = CURRENT_TIMESTAMP(6) WHERE id=%s", (task_id,))
+    bump_versions("attachments")
+    return inserted.get("lastrowid")
+
+def collect_attachment_files(removed):
+    """Deletes the stored files of removed attachment rows that nothing references any more.
+
+    removed: (url, content_hash) pairs of rows that were just deleted.
+    """
+    with blob_lock():
+        for url, content_hash in set(removed):
+            name = os.path.basename(url or "")
+            if not name:
+                continue
+            if content_hash is not None:
+                refs = execute_query("SELECT COUNT(*) AS refs FROM attachments WHERE content_hash=%s AND url=%s",
+                                     (content_hash, url), fetch_one=True, dictionary=True)
+                if refs and refs['refs']:
+                    continue
+            # Rows from before content addressing (content_hash NULL) each own their file
+            storage.delete(name)
+            remove_thumbnails(name)
+
+# Thumbnails/previews of image attachments, served by GET /files/<name>?size=<size>.
+# They are rendered by a small background pool after upload (or on the first request
+# that misses) and cached in THUMBNAILS_DIR, which is local to each replica. Stored
+# names are content hashes, so a cached rendition never goes stale.
+THUMBNAIL_SIZES = {"thumb": 160, "preview": 800} # longest edge in pixels
+THUMBNAILABLE_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp")
+# Images above this are skipped; Image.open only reads the header, so the check is cheap
+THUMBNAIL_MAX_PIXELS = 50_000_000
+
+_thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnailer")
+_thumbnails_pending = set()
+_thumbnails_lock = threading.Lock()
+
+def can_thumbnail(name):
+    return Image is not None and mimetypes.guess_type(name)[0] in THUMBNAILABLE_TYPES
+
+def find_thumbnail(name, size):
+    """Path of the cached rendition of `name` at `size`, or None."""
+    for ext in (".jpg", ".png"):
+        path = os.path.join(THUMBNAILS_DIR, f"{os.path.splitext(name)[0]}-{size}{ext}")
+        if os.path.isfile(path):
+            return path
+    return None
+
+def schedule_thumbnails(name):
+    """Queues rendering of every THUMBNAIL_SIZES variant of `name`; returns immediately."""
+    if not can_thumbnail(name):
+        return
+    with _thumbnails_lock:
+        if name in _thumbnails_pending:
+            return
+        _thumbnails_pending.add(name)
+    _thumbnail_executor.submit(_render_thumbnails, name)
+
+def _render_thumbnails(name):
+    try:
+        os.makedirs(THUMBNAILS_DIR, exist_ok=True)
+        with storage.open(name) as fh:
+            with Image.open(fh) as img:
+                if img.width * img.height > THUMBNAIL_MAX_PIXELS:
+                    print(f"Thumbnails: skipping {name}, {img.width}x{img.height} is too large")
+                    return
+                largest = max(THUMBNAIL_SIZES.values())
+                # JPEG can decode straight at a reduced scale, much cheaper than a full decode
+                img.draft("RGB", (largest, largest))
+                img = ImageOps.exif_transpose(img)
+                has_alpha = img.mode in ("RGBA", "LA", "P") and ("A" in img.mode or "transparency" in img.info)
+                img = img.convert("RGBA" if has_alpha else "RGB")
+                # Largest first, so each smaller size is scaled down from the previous one
+                for size, edge in sorted(THUMBNAIL_SIZES.items(), key=lambda item: -item[1]):
+                    img.thumbnail((edge, edge), Image.LANCZOS)
+                    ext, fmt, options = (".png", "PNG", {"optimize": True}) if has_alpha else (".jpg", "JPEG", {"quality": 82, "optimize": True})
+                    target = os.path.join(THUMBNAILS_DIR, f"{os.path.splitext(name)[0]}-{size}{ext}")
+                    fd, tmp_path = tempfile.mkstemp(dir=THUMBNAILS_DIR, prefix=".thumb-")
+                    try:
+                        with os.fdopen(fd, "wb") as out:
+                            img.save(out, fmt, **options)
+                        os.replace(tmp_path, target)
+                    except BaseException:
+                        os.unlink(tmp_path)
+                        raise
+    except Exception as e:
+        print(f"Thumbnails: could not render {name}: {e}")
+    finally:
+        with _thumbnails_lock:
+            _thumbnails_pending.discard(name)
+
+def remove_thumbnails(name):
+    for size in THUMBNAIL_SIZES:
+        path = find_thumbnail(name, size)
+        if path:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+# Helpers for the opaque keyset cursor used by GET /tasks.
+# The cursor is the (created_at, id) of the last task on the previous page.
+# tasks.created_at is NOT NULL since migration 011, which gave the NULL rows this value
+NULL_CREATED_AT = datetime(1970, 1, 1)
+
+def encode_cursor(created_at, task_id):
+    raw = f"{created_at.isoformat()}|{task_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    created_at_raw, task_id_raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|", 1)
+    # An empty created_at comes from a cursor issued before 011
+    created_at = datetime.fromisoformat(created_at_raw) if created_at_raw else NULL_CREATED_AT
+    return created_at, int(task_id_raw)
+
+# GET /tasks/search pages by offset (results are ordered by relevance, which has
+# no stable keyset); the cursor keeps it opaque like the /tasks one.
+MAX_SEARCH_OFFSET = 1000
+MAX_SEARCH_TERMS = 16
+SEARCH_TASK_WEIGHT = 2.0 # a hit in the title/description outranks one in a comment
+_FULLTEXT_OPERATORS = re.compile(r'[-+<>()~*"@]+')
+
+def fulltext_query(text):
+    """Turn free text into a BOOLEAN MODE query: any word, each as a prefix."""
+    words = _FULLTEXT_OPERATORS.sub(" ", text).split()[:MAX_SEARCH_TERMS]
+    return " ".join(word + "*" for word in words)
+
+def encode_offset_cursor(offset):
+    return base64.urlsafe_b64encode(f"o{offset}".encode("ascii")).decode("ascii").rstrip("=")
+
+def decode_offset_cursor(cursor):
+    raw = base64.urlsafe_b64decode((cursor + "=" * (-len(cursor) % 4)).encode("ascii")).decode("ascii")
+    if not raw.startswith("o"):
+        raise ValueError("not a search cursor")
+    return int(raw[1:])
+
+TASK_STATUSES = ('TODO', 'IN_PROGRESS', 'DONE')
+TASK_PRIORITIES = ('LOW', 'MEDIUM', 'HIGH')
+
+def _int_list(raw):
+    return [int(x) for x in raw.split(',') if x.strip()]
+
+def _enum_list(raw, allowed, name):
+    values = [x.strip().upper() for x in raw.split(',') if x.strip()]
+    for value in values:
+        if value not in allowed:
+            raise ValueError(f"Invalid {name} value: {value}")
+    return values
+
+# Fields that admins and the team's leader may change on an existing task
+TASK_UPDATE_FIELDS = {
+    'title': str, 'description': str, 'status': str,
+    'priority': str, 'due_date': str, 'assigned_to': int, 'team_id': int
+}
+
+# Columns written by GET /tasks/export and read back by POST /tasks/import
+# (import ignores id, created_by and the timestamps: those come from the database
+# and the caller)
+EXPORT_COLUMNS = ('id', 'title', 'description', 'status', 'priority', 'due_date', 'team_id',
+                  'created_by', 'assigned_to', 'created_at', 'updated_at')
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    encode = _JSON_ENCODERS.get(type(value))
+    return encode(value) if encode else value
+
+def _body_lines(rfile, length):
+    """Decoded lines of a request body of the given length, read one at a time."""
+    remaining = length
+    while remaining > 0:
+        line = rfile.readline(min(remaining, IMPORT_MAX_LINE))
+        if not line:
+            return
+        remaining -= len(line)
+        if not line.endswith(b"\n") and remaining > 0:
+            raise ValueError(f"Line longer than {IMPORT_MAX_LINE} bytes")
+        yield line.decode("utf-8")
+
+def import_rows(lines, fmt):
+    """Yield (line number, dict or error message) for each record in an NDJSON or CSV body."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # Empty cells mean "not set", like a missing JSON key
+            yield reader.line_num, {k: v for k, v in record.items() if k and v not in ("", None)}
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, f"Invalid JSON: {e.msg}"
+            continue
+        yield number, record if isinstance(record, dict) else "Each line must be a JSON object"
+
+def task_update_permissions(task, role, user_id):
+    """Fields the caller may set on task (a row with its team's leader_id), or None if none at all."""
+    if role == 'ADMIN' or (role == 'TEAM_LEADER' and task.get('leader_id') == user_id):
+        return TASK_UPDATE_FIELDS
+    if task.get('assigned_to') is not None and task.get('assigned_to') == user_id:
+        return {'status': str} # Assignee can only change status
+    if task.get('created_by') == user_id:
+        return {} # Creator might get more permissions later; for now they can't edit
+    return None
+
+def _is_task_id(value):
+    # JSON true/false decode to bool, which is an int subclass
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def can_delete_task(task, role, user_id):
+    # Admin, the team's leader, or the creator
+    return role == 'ADMIN' or (role == 'TEAM_LEADER' and task.get('leader_id') == user_id) or task.get('created_by') == user_id
+
+def parse_task_updates(data, allowed_fields):
+    """Return the allowed fields present in data, converted. Raises ValueError on a bad value."""
+    updates = {}
+    for field, field_type in allowed_fields.items():
+        if field not in data or data[field] is None:
+            continue
+        try:
+            value = int(data[field]) if field_type == int else str(data[field]).strip()
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid value for field '{field}': {e}")
+        if field == 'status' and value not in TASK_STATUSES:
+            raise ValueError(f"Invalid value for field '{field}': {value}")
+        if field == 'priority' and value not in TASK_PRIORITIES:
+            raise ValueError(f"Invalid value for field '{field}': {value}")
+        if field == 'due_date':
+            date.fromisoformat(value) # raises ValueError, which names the bad date
+        updates[field] = value
+    return updates
+
+# Translate GET /tasks query parameters into SQL conditions so filtering happens in MySQL.
+# All filters are ANDed together; list-valued filters accept comma-separated values.
+#   teamId, assignedTo, createdBy   -> ids (e.g. assignedTo=3,4)
+#   status, priority                -> enum values (e.g. status=TODO,IN_PROGRESS)
+#   dueFrom, dueTo                  -> inclusive YYYY-MM-DD bounds on due_date
+#   mine=1                          -> tasks assigned to the X-User-Id requester
+#   mine=team                       -> assigned to the requester or in a team they lead
+# Raises ValueError on malformed input.
+def build_task_filters(query_params, user_id):
+    conditions = []
+    params = []
+
+    def add_in(column, values):
+        if not values:
+            raise ValueError(f"Empty filter for {column}")
+        conditions.append(f"{column} IN ({','.join(['%s'] * len(values))})")
+        params.extend(values)
+
+    if 'teamId' in query_params:
+        add_in("t.team_id", _int_list(query_params['teamId'][0]))
+    if 'assignedTo' in query_params:
+        add_in("t.assigned_to", _int_list(query_params['assignedTo'][0]))
+    if 'createdBy' in query_params:
+        add_in("t.created_by", _int_list(query_params['createdBy'][0]))
+    if 'status' in query_params:
+        add_in("t.status", _enum_list(query_params['status'][0], TASK_STATUSES, 'status'))
+    if 'priority' in query_params:
+        add_in("t.priority", _enum_list(query_params['priority'][0], TASK_PRIORITIES, 'priority'))
+    if 'dueFrom' in query_params:
+        conditions.append("t.due_date >= %s")
+        params.append(date.fromisoformat(query_params['dueFrom'][0]))
+    if 'dueTo' in query_params:
+        conditions.append("t.due_date <= %s")
+        params.append(date.fromisoformat(query_params['dueTo'][0]))
+
+    mine = query_params.get('mine', [''])[0].lower()
+    if mine:
+        if not user_id:
+            raise ValueError("mine requires the X-User-Id header")
+        if mine in ('1', 'true', 'yes'):
+            conditions.append("t.assigned_to = %s")
+            params.append(user_id)
+        elif mine == 'team':
+            conditions.append("(t.assigned_to = %s OR t.team_id IN (SELECT id FROM teams WHERE leader_id = %s))")
+            params.extend([user_id, user_id])
+        elif mine not in ('0', 'false', 'no'):
+            raise ValueError(f"Invalid mine value: {mine}")
+
+    return conditions, params
+
 # Helper function for database operations
 def execute_query(query, params=None, fetch_one=False, fetch_all=False, dictionary=True):
+    # Inside a request reuse its connection; otherwise check one out just for this statement
+    scoped = getattr(_request_state, "active", False)
     conn = None
     cur = None
     try:
-        conn = get_db_conn()
-        cur = conn.cursor(dictionary=dictionary)
+        conn = _request_conn() if scoped else get_db_conn()
+        # fetch_one buffers so unread rows can't block the next statement on a shared connection
+        cur = conn.cursor(dictionary=dictionary, buffered=fetch_one)
         cur.execute(query, params or ())
         if fetch_all:
             result = cur.fetchall()
@@ -45,7 +901,7 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False, dictiona
             result = cur.fetchone()
             return result
         else: # For INSERT, UPDATE, DELETE
-            conn.commit()
+            # Connections are autocommit; inside transaction() the commit happens once at the end
             return {"lastrowid": cur.lastrowid} if "INSERT" in query else {"rowcount": cur.rowcount}
     except Exception as e:
         print(f"Database error: {e}")
@@ -53,114 +909,1064 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False, dictiona
     finally:
         if cur:
             cur.close()
-        if conn:
+        if conn and not scoped:
             conn.close()
 
-# Helper function to fetch user details
+def execute_many(query, seq_params):
+    """executemany() on the request's connection. mysql-connector sends an
+    INSERT ... VALUES as one multi-row statement; other statements run once per row."""
+    scoped = getattr(_request_state, "active", False)
+    conn = None
+    cur = None
+    try:
+        conn = _request_conn() if scoped else get_db_conn()
+        cur = conn.cursor()
+        cur.executemany(query, seq_params)
+        return {"lastrowid": cur.lastrowid, "rowcount": cur.rowcount}
+    except Exception as e:
+        print(f"Database error: {e}")
+        raise e
+    finally:
+        if cur:
+            cur.close()
+        if conn and not scoped:
+            conn.close()
+
+def stream_query(query, params=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of row dicts from an unbuffered (server-side streamed) cursor.
+
+    Only batch_size rows are in memory at a time. Use inside closing(): if the
+    consumer stops early the rest of the result is drained, since a connection
+    with an unread result can't go back to the pool.
+    """
+    scoped = getattr(_request_state, "active", False)
+    conn = _request_conn() if scoped else get_db_conn()
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute(query, params or ())
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        try:
+            while cur.fetchmany(batch_size):
+                pass
+        except Exception:
+            pass # nothing left to read, or the statement never ran
+        cur.close()
+        if not scoped:
+            conn.close()
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+
+class ServiceClient:
+    """Keep-alive HTTP client for calls to another PMS service.
+
+    Wraps a requests.Session (so TCP connections are reused across requests)
+    with a per-call timeout, retries with exponential backoff for connection
+    errors and 5xx responses, and a circuit breaker: after BREAKER_THRESHOLD
+    consecutive failures calls fail fast for BREAKER_RESET seconds, then a
+    single trial call decides whether to close the circuit again.
+    """
+
+    def __init__(self, name, base_url, pool_size=10):
+        self.name = name
+        self.base_url = base_url
+        self.session = requests.Session()
+        # Authenticates the call; the caller's identity goes in X-User-Id / X-User-Role
+        self.session.headers[INTERNAL_SECRET_HEADER] = INTERNAL_SECRET
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def _before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < BREAKER_RESET or self._trial_in_flight:
+                raise CircuitOpenError(f"{self.name}: circuit open, skipping call")
+            self._trial_in_flight = True # half-open: let exactly one call through
+
+    def _record(self, ok):
+        with self._lock:
+            self._trial_in_flight = False
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= BREAKER_THRESHOLD:
+                if self._opened_at is None:
+                    print(f"{self.name}: opening circuit after {self._failures} failures")
+                self._opened_at = time.monotonic()
+
+    def get_json(self, path, headers=None):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = self._get_json(path, headers)
+            outcome = "ok"
+            return result
+        except CircuitOpenError:
+            outcome = "circuit_open"
+            raise
+        finally:
+            metrics.observe("upstream_request_duration_seconds", (self.name, outcome), time.perf_counter() - started)
+
+    def _get_json(self, path, headers):
+        try:
+            self._before_call()
+        except CircuitOpenError:
+            metrics.inc("upstream_errors_total", (self.name, "circuit_open"))
+            raise
+        last_error = None
+        reached = False
+        try:
+            for attempt in range(SERVICE_RETRIES + 1):
+                if attempt:
+                    time.sleep(SERVICE_BACKOFF * (2 ** (attempt - 1)))
+                try:
+                    response = self.session.get(self.base_url + path, headers=headers, timeout=SERVICE_TIMEOUT)
+                    if response.status_code >= 500:
+                        response.raise_for_status()
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                        requests.exceptions.ChunkedEncodingError, requests.exceptions.HTTPError) as e:
+                    reason = ("timeout" if isinstance(e, requests.exceptions.Timeout)
+                              else "http_5xx" if isinstance(e, requests.exceptions.HTTPError) else "connection")
+                    metrics.inc("upstream_errors_total", (self.name, reason))
+                    last_error = e
+                    continue
+                except requests.exceptions.RequestException:
+                    # Redirect loops, undecodable bodies...: retrying won't help
+                    metrics.inc("upstream_errors_total", (self.name, "other"))
+                    raise
+                # Reached the service; a 4xx is the caller's problem, not an outage
+                reached = True
+                if response.status_code >= 400:
+                    metrics.inc("upstream_errors_total", (self.name, "http_4xx"))
+                response.raise_for_status()
+                return response.json()
+            raise last_error
+        finally:
+            # Always settle the call, or a failed half-open trial would keep the circuit open for good
+            self._record(reached)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after being stored."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict() # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys):
+        """Return ({key: value} for fresh entries, [keys that missed])."""
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and entry[0] > now:
+                    self._data.move_to_end(key)
+                    found[key] = entry[1]
+                else:
+                    if entry is not None:
+                        del self._data[key]
+                    missing.append(key)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def set_many(self, mapping):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys=None):
+        with self._lock:
+            if keys is None:
+                self._data.clear()
+            else:
+                for key in keys:
+                    self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+user_cache = TTLCache(DETAILS_CACHE_SIZE, DETAILS_CACHE_TTL)
+team_cache = TTLCache(DETAILS_CACHE_SIZE, DETAILS_CACHE_TTL)
+
+user_service = ServiceClient("user-service", USER_SERVICE_URL)
+team_service = ServiceClient("team-service", TEAM_SERVICE_URL)
+# Runs the user and team lookups of one request side by side
+_lookup_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="service-lookup")
+
+def _forwarded_headers(handler):
+    headers = {}
+    if handler: # Pass relevant headers if available
+        if handler.headers.get("X-User-Id"):
+            headers["X-User-Id"] = handler.headers.get("X-User-Id")
+        if handler.headers.get("X-User-Role"):
+            headers["X-User-Role"] = handler.headers.get("X-User-Role")
+    return headers
+
+# Helper function to fetch user details (served from user_cache where possible)
 def get_user_details(user_ids, handler=None):
     if not user_ids:
         return {}
     
-    user_ids_str = ",".join(map(str, user_ids))
+    user_map, missing = user_cache.get_many(user_ids)
+    if not missing:
+        return user_map
+    user_ids_str = ",".join(map(str, missing))
     try:
-        headers = {}
-        if handler: # Pass relevant headers if available
-            if handler.headers.get("X-User-Id"):
-                headers["X-User-Id"] = handler.headers.get("X-User-Id")
-            if handler.headers.get("X-User-Role"):
-                headers["X-User-Role"] = handler.headers.get("X-User-Role")
-
-        response = requests.get(f"{USER_SERVICE_URL}/users?ids={user_ids_str}", headers=headers)
-        response.raise_for_status()
-        users_data = response.json()
+        users_data = user_service.get_json(f"/users?ids={user_ids_str}", headers=_forwarded_headers(handler))
         
         # Map user ID to user details (username specifically)
-        user_map = {user['id']: user for user in users_data}
+        fetched = {user['id']: user for user in users_data}
+        user_cache.set_many(fetched)
+        user_map.update(fetched)
         return user_map
     except requests.exceptions.RequestException as e:
         print(f"Error fetching user details for IDs {user_ids_str}: {e}")
         if hasattr(e, 'response') and e.response is not None:
             print(f"Response Status Code: {e.response.status_code}")
             print(f"Response Text: {e.response.text}")
-        return {} # Return empty dict if fetching fails
+        return user_map # Return what the cache had if fetching fails
 
-# Helper function to fetch team details
+# Helper function to fetch team details (served from team_cache where possible)
 def get_team_details(team_ids, handler=None):
     if not team_ids:
         return {}
     
-    team_ids_str = ",".join(map(str, team_ids))
+    team_map, missing = team_cache.get_many(team_ids)
+    if not missing:
+        return team_map
+    team_ids_str = ",".join(map(str, missing))
     try:
-        headers = {}
-        if handler: # Pass relevant headers if available
-            if handler.headers.get("X-User-Id"):
-                headers["X-User-Id"] = handler.headers.get("X-User-Id")
-            if handler.headers.get("X-User-Role"):
-                headers["X-User-Role"] = handler.headers.get("X-User-Role")
-
-        response = requests.get(f"{TEAM_SERVICE_URL}/teams?ids={team_ids_str}", headers=headers)
-        response.raise_for_status()
-        teams_data = response.json()
+        teams_data = team_service.get_json(f"/teams?ids={team_ids_str}", headers=_forwarded_headers(handler))
         
-        team_map = {team['id']: team for team in teams_data}
+        fetched = {team['id']: team for team in teams_data}
+        team_cache.set_many(fetched)
+        team_map.update(fetched)
         return team_map
     except requests.exceptions.RequestException as e:
         print(f"Error fetching team details for IDs {team_ids_str}: {e}")
         if hasattr(e, 'response') and e.response is not None:
             print(f"Response Status Code: {e.response.status_code}")
             print(f"Response Text: {e.response.text}")
-        return {}
+        return team_map
 
+# Fetch user and team details concurrently; returns (user_map, team_map)
+def get_user_and_team_details(user_ids, team_ids, handler=None):
+    teams_future = _lookup_executor.submit(get_team_details, team_ids, handler)
+    user_map = get_user_details(user_ids, handler)
+    return user_map, teams_future.result()
 
-class TaskServiceHandler(BaseHTTPRequestHandler):
-    
-    def _set_headers(self, status=200, content_type="application/json"):
-        self.send_response(status)
-        self.send_header("Content-Type", content_type)
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization, X-User-Role, X-User-Id")
-        self.end_headers()
 
-    def do_OPTIONS(self):
-        self._set_headers(200)
+# Incremental sync (?since=) and listing ETags, on the request's connection (see pms_common)
+def new_sync_token():
+    return pms_common.new_sync_token(_request_conn())
+
+def deleted_since(entity, since):
+    return pms_common.deleted_since(_request_conn(), entity, since)
+
+def bump_versions(*tables):
+    pms_common.bump_versions(_request_conn(), *tables)
+
+def listing_etag(handler, tables, extra=""):
+    return pms_common.listing_etag(_request_conn(), handler, tables, extra)
+
+
+# Server-sent events (GET /events). Streams are in-process: each task-service
+# replica only sees the writes it handles, and a client that reconnects should
+# catch up through GET /tasks?since=.
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))        # seconds between keepalive comments
+SSE_MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", "10000"))   # open streams per replica
+SSE_MAX_BUFFER = 256 * 1024  # bytes queued for one client before it counts as stalled and is dropped
+SSE_RETRY_MS = 3000          # reconnect delay suggested to EventSource
+
+class _Subscriber:
+    __slots__ = ("sock", "teams", "users", "everything", "buffer", "writing")
+
+    def __init__(self, sock, teams, users, everything):
+        self.sock = sock
+        self.teams = teams
+        self.users = users
+        self.everything = everything
+        self.buffer = bytearray()
+        self.writing = False
+
+    def wants(self, team_id, user_ids):
+        return self.everything or team_id in self.teams or not self.users.isdisjoint(user_ids)
+
+
+class EventHub:
+    """Holds the open GET /events streams and pushes task events to them.
+
+    One thread multiplexes every stream with a selector, so an idle subscriber
+    costs a socket and a small buffer instead of a worker thread and a database
+    connection. Other threads only queue work and wake the loop through a socketpair.
+    """
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._subscribers = {}  # socket -> _Subscriber, only touched by the hub thread
+        self._owned = set()     # sockets handed over, checked by the HTTP server's workers
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._next_id = 0
+
+    def start(self):
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        threading.Thread(target=self._run, name="event-hub", daemon=True).start()
+
+    def owns(self, sock):
+        with self._lock:
+            return sock in self._owned
+
+    def client_count(self):
+        with self._lock:
+            return len(self._owned)
+
+    def attach(self, sock, teams, users, everything):
+        """Take over an event-stream socket whose response headers were already sent."""
+        with self._lock:
+            if len(self._owned) >= SSE_MAX_CLIENTS:
+                return False
+            self._owned.add(sock)
+            self._pending.append((_Subscriber(sock, teams, users, everything), None))
+        self._wake()
+        return True
+
+    def publish(self, event_type, data, team_id=None, user_ids=()):
+        """Queue an event for subscribers of team_id or of any of user_ids (and admins watching everything)."""
+        with self._lock:
+            if not self._owned:
+                return # nobody is listening; skip the encoding
+            self._next_id += 1
+            message = b"id: %d\nevent: %s\ndata: %s\n\n" % (self._next_id, event_type.encode("ascii"), json_bytes(data))
+            self._pending.append((message, (team_id, {u for u in user_ids if u})))
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass # the pipe is full, so a wakeup is already pending
+
+    def _run(self):
+        next_keepalive = time.monotonic() + SSE_KEEPALIVE
+        while True:
+            for key, mask in self._selector.select(max(0.0, next_keepalive - time.monotonic())):
+                if key.fileobj is self._wake_r:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                    continue
+                sub = key.data
+                if sub.sock not in self._subscribers:
+                    continue # dropped earlier in this round
+                if mask & selectors.EVENT_READ:
+                    # Clients send nothing after the request, so readable means hung up
+                    try:
+                        closed = not sub.sock.recv(4096)
+                    except BlockingIOError:
+                        closed = False
+                    except OSError:
+                        closed = True
+                    if closed:
+                        self._drop(sub)
+                        continue
+                if mask & selectors.EVENT_WRITE:
+                    self._flush(sub)
+
+            with self._lock:
+                pending = list(self._pending)
+                self._pending.clear()
+            for item, target in pending:
+                if target is None:
+                    item.sock.setblocking(False)
+                    self._subscribers[item.sock] = item
+                    self._selector.register(item.sock, selectors.EVENT_READ, item)
+                    continue
+                team_id, user_ids = target
+                for sub in list(self._subscribers.values()):
+                    if sub.wants(team_id, user_ids):
+                        self._send(sub, item)
+
+            if time.monotonic() >= next_keepalive:
+                # Comments keep proxies and load balancers from timing out idle streams
+                for sub in list(self._subscribers.values()):
+                    self._send(sub, b": keepalive\n\n")
+                next_keepalive = time.monotonic() + SSE_KEEPALIVE
+
+    def _send(self, sub, message):
+        if len(sub.buffer) + len(message) > SSE_MAX_BUFFER:
+            self._drop(sub) # EventSource reconnects and the client resyncs
+            return
+        sub.buffer += message
+        if not sub.writing:
+            self._flush(sub)
+
+    def _flush(self, sub):
+        try:
+            while sub.buffer:
+                sent = sub.sock.send(sub.buffer)
+                del sub.buffer[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop(sub)
+            return
+        writing = bool(sub.buffer)
+        if writing != sub.writing:
+            sub.writing = writing
+            self._selector.modify(sub.sock, selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0), sub)
+
+    def _drop(self, sub):
+        if self._subscribers.pop(sub.sock, None) is None:
+            return
+        self._selector.unregister(sub.sock)
+        with self._lock:
+            self._owned.discard(sub.sock)
+        try:
+            sub.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sub.sock.close()
+
+
+event_hub = EventHub()
+
+def publish_task_event(event_type, data, task_id):
+    """Publish a comment/attachment event to the subscribers of its task."""
+    if not event_hub.client_count():
+        return
+    task = execute_query("SELECT team_id, created_by, assigned_to FROM tasks WHERE id=%s", (task_id,), fetch_one=True, dictionary=True)
+    if task:
+        event_hub.publish(event_type, data, task["team_id"], (task["created_by"], task["assigned_to"]))
+
+
+metrics.register("gauge", "db_pool_size", "Pooled database connections, plus overflow connections allowed past the pool.", ("kind",),
+                 read=lambda: {("pool",): DB_POOL_SIZE, ("overflow",): DB_POOL_OVERFLOW})
+metrics.register("counter", "db_pool_overflow_total", "Connections opened past the pool size.")
+metrics.register("gauge", "sse_clients", "Open GET /events streams.", read=lambda: {(): event_hub.client_count()})
+metrics.register("counter", "details_cache_hits_total", "User/team detail lookups served from cache.", ("cache",),
+                 read=lambda: {("users",): user_cache.stats()["hits"], ("teams",): team_cache.stats()["hits"]})
+metrics.register("counter", "details_cache_misses_total", "User/team detail lookups that went to the owning service.", ("cache",),
+                 read=lambda: {("users",): user_cache.stats()["misses"], ("teams",): team_cache.stats()["misses"]})
+
+
+class TaskServiceHandler(ServiceHandler):
+    # Attachments are opened by <img>/<a> tags, which can't send a token; file names are unguessable
+    token_exempt_prefixes = ("/files/",)
+
+    def request_token(self):
+        # EventSource can't set headers either, so GET /events takes the token as ?token=
+        path, _, query = self.path.partition("?")
+        if path == "/events" and "token" in parse_qs(query):
+            return parse_qs(query)["token"][0]
+        return super().request_token()
+
+    def request_scope(self):
+        # One DB connection per request, however many queries the handler runs; the
+        # response goes out after it is back in the pool, so slow clients don't hold it
+        return request_connection()
 
     def do_GET(self):
         parsed_path = urlparse(self.path)
         path = parsed_path.path
         
         if path.startswith('/files/'):
-            self.handle_file_serving(path)
+            self.handle_file_serving(parsed_path)
+            return
+
+        if path == "/tasks/export":
+            self.handle_task_export(parsed_path)
+            return
+
+        if path == "/tasks/search":
+            self.handle_task_search(parsed_path)
+            return
+
+        if path == "/tasks/stats":
+            self.handle_task_stats(parsed_path)
             return
 
         if path == "/tasks" or path.startswith('/tasks/'):
             self.handle_get_tasks(parsed_path)
             return
+
+        if path == "/cache/stats":
+            self._set_headers(200)
+            self.wfile.write(json_bytes({"users": user_cache.stats(), "teams": team_cache.stats()}))
+            return
+
+        if path == "/events":
+            self.handle_event_stream(parsed_path)
+            return
+
+        if path == "/metrics":
+            self._set_headers(200, "text/plain; version=0.0.4; charset=utf-8")
+            self.wfile.write(metrics.render())
+            return
         
         self._set_headers(404)
-        self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+        self.wfile.write(json_bytes({"error": "Not found"}))
 
-    def handle_file_serving(self, path):
-        fname = path.split('/files/', 1)[1]
-        uploads_dir = os.path.join(os.path.dirname(__file__), 'uploads')
-        fpath = os.path.join(uploads_dir, fname)
+    def do_HEAD(self):
+        parsed_path = urlparse(self.path)
+        if parsed_path.path.startswith('/files/'):
+            self.handle_file_serving(parsed_path, head_only=True)
+            return
+        self._set_headers(404)
+
+    def _parse_range(self, range_header, size):
+        # Single "bytes=start-end" / "bytes=start-" / "bytes=-suffix" range -> (start, end) inclusive.
+        # Returns None for anything we do not support (the full file is sent) and
+        # raises ValueError when the range cannot be satisfied.
+        if not range_header.startswith("bytes=") or "," in range_header:
+            return None
+        start_raw, _, end_raw = range_header[len("bytes="):].strip().partition("-")
+        try:
+            if start_raw == "":
+                suffix = int(end_raw)
+                if suffix <= 0:
+                    raise ValueError("empty suffix range")
+                return max(size - suffix, 0), size - 1
+            start = int(start_raw)
+            end = int(end_raw) if end_raw else size - 1
+        except ValueError:
+            return None
+        if start >= size or end < start:
+            raise ValueError("range not satisfiable")
+        return start, min(end, size - 1)
+
+    def handle_file_serving(self, parsed_path, head_only=False):
+        fname = os.path.basename(parsed_path.path.split('/files/', 1)[1])
+        # Checked before touching storage: S3Storage has no local path to look at
+        if not fname:
+            self._set_headers(404)
+            if not head_only:
+                self.wfile.write(json_bytes({"error": "File not found"}))
+            return
+        size = parse_qs(parsed_path.query).get('size', [None])[0]
+        if size:
+            self.handle_thumbnail_serving(fname, size, head_only)
+            return
+        redirect_url = storage.download_url(fname)
+        if redirect_url:
+            # Object store: send the client straight to it with a short-lived presigned URL
+            self._send_redirect(302, redirect_url)
+            return
+        fpath = storage.path(fname)
         
-        if os.path.exists(fpath) and os.path.isfile(fpath):
-            try:
-                import mimetypes
-                ctype = mimetypes.guess_type(fpath)[0] or 'application/octet-stream'
-                self.send_response(200)
-                self.send_header('Content-Type', ctype)
+        if not os.path.isfile(fpath):
+            self._set_headers(404)
+            if not head_only:
+                self.wfile.write(json_bytes({"error": "File not found"}))
+            return
+        self._send_file(fpath, head_only)
+
+    def handle_thumbnail_serving(self, fname, size, head_only=False):
+        if size not in THUMBNAIL_SIZES:
+            self._set_headers(400)
+            if not head_only:
+                self.wfile.write(json_bytes({"error": f"Unknown size, expected one of: {', '.join(THUMBNAIL_SIZES)}"}))
+            return
+        if mimetypes.guess_type(fname)[0] not in THUMBNAILABLE_TYPES:
+            self._set_headers(404)
+            if not head_only:
+                self.wfile.write(json_bytes({"error": "No preview available for this file"}))
+            return
+        thumb_path = find_thumbnail(fname, size)
+        if thumb_path:
+            self._send_file(thumb_path, head_only)
+            return
+        # Not rendered yet (still queued, evicted, or uploaded through another replica):
+        # queue it and let the client make do with the original this time
+        schedule_thumbnails(fname)
+        self._send_redirect(307, f"/files/{fname}")
+
+    def _send_redirect(self, status, location):
+        self.send_response(status)
+        self.send_header('Location', location)
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_file(self, fpath, head_only=False):
+        fname = os.path.basename(fpath)
+        headers_sent = False
+        try:
+            with open(fpath, 'rb') as fh:
+                st = os.fstat(fh.fileno())
+                size = st.st_size
+                etag = f'"{size:x}-{st.st_mtime_ns:x}"'
+                last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+
+                # Conditional GET: If-None-Match wins over If-Modified-Since
+                if_none_match = self.headers.get('If-None-Match')
+                not_modified = False
+                if if_none_match:
+                    not_modified = etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+                elif self.headers.get('If-Modified-Since'):
+                    try:
+                        since = email.utils.parsedate_to_datetime(self.headers['If-Modified-Since']).timestamp()
+                        not_modified = int(st.st_mtime) <= since
+                    except (TypeError, ValueError):
+                        pass
+
+                status = 200
+                start, end = 0, size - 1
+                range_header = self.headers.get('Range')
+                if_range = self.headers.get('If-Range')
+                if not not_modified and range_header and size and (not if_range or if_range.strip() == etag):
+                    try:
+                        byte_range = self._parse_range(range_header, size)
+                    except ValueError:
+                        headers_sent = True
+                        self.send_response(416)
+                        self.send_header('Content-Range', f'bytes */{size}')
+                        self.send_header('Access-Control-Allow-Origin', '*')
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    if byte_range:
+                        start, end = byte_range
+                        status = 206
+
+                headers_sent = True
+                self.send_response(304 if not_modified else status)
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', last_modified)
+                self.send_header('Cache-Control', FILES_CACHE_CONTROL)
+                self.send_header('Accept-Ranges', 'bytes')
                 self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Expose-Headers', 'ETag, Content-Range, Accept-Ranges, Content-Length')
+                if not_modified:
+                    self.end_headers()
+                    return
+                self.send_header('Content-Type', mimetypes.guess_type(fname)[0] or 'application/octet-stream')
+                self.send_header('Content-Length', str(end - start + 1))
+                if status == 206:
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
                 self.end_headers()
-                with open(fpath, 'rb') as fh:
-                    self.wfile.write(fh.read())
+                if head_only or size == 0:
+                    return
+                # socket.sendfile uses os.sendfile where available: no copy through Python memory
+                self.wfile.flush()
+                self.connection.sendfile(fh, offset=start, count=end - start + 1)
+        except (BrokenPipeError, ConnectionResetError):
+            # client went away mid-download; it can resume with a Range request
+            self.close_connection = True
+        except Exception as e:
+            print(f"Error in handle_file_serving: {e}")
+            if headers_sent:
+                # The body may be cut short of its Content-Length
+                self.close_connection = True
+            else:
+                self._set_headers(500)
+                self.wfile.write(json_bytes({"error": str(e)}))
+
+    def handle_event_stream(self, parsed_path):
+        """GET /events: a text/event-stream of task, comment and attachment changes.
+
+        Filters (combined with OR): teamId=1,2, userId=3 (tasks created by or
+        assigned to them), mine=1 (the caller), mine=team (the caller plus the
+        teams they lead). Without filters admins get everything and everyone
+        else gets mine=1. The token may be passed as ?token= (see request_token).
+        """
+        query_params = parse_qs(parsed_path.query)
+        user_id, role = int(self.headers.get("X-User-Id", "0")), self.headers.get("X-User-Role", "MEMBER")
+        if not user_id:
+            self._set_headers(401)
+            self.wfile.write(json_bytes({"error": "Unauthorized: X-User-Id header missing"}))
+            return
+
+        try:
+            teams = set(_int_list(query_params["teamId"][0])) if "teamId" in query_params else set()
+            users = set(_int_list(query_params["userId"][0])) if "userId" in query_params else set()
+        except ValueError:
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": "teamId and userId must be comma-separated ids"}))
+            return
+        mine = query_params.get("mine", [None])[0]
+        if mine in ("1", "team"):
+            users.add(user_id)
+        if mine == "team":
+            led = execute_query("SELECT id FROM teams WHERE leader_id=%s", (user_id,), fetch_all=True, dictionary=False)
+            teams.update(row[0] for row in led)
+        everything = role == "ADMIN" and not teams and not users
+        if not (everything or teams or users):
+            users.add(user_id)
+
+        if event_hub.client_count() >= SSE_MAX_CLIENTS:
+            self._set_headers(503)
+            self.wfile.write(json_bytes({"error": "Too many event streams, retry later"}))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("X-Accel-Buffering", "no") # keep reverse proxies from buffering the stream
+        # The hub keeps the socket and the stream ends when it closes; this worker (and its
+        # DB connection) is free once we return
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(b"retry: %d\n\n" % SSE_RETRY_MS)
+        self.wfile.flush()
+        event_hub.attach(self.connection, teams, users, everything)
+
+    def handle_task_export(self, parsed_path):
+        """GET /tasks/export?format=ndjson|csv: every matching task, streamed.
+
+        Takes the GET /tasks filters. Rows go out in id order as they come off a
+        server-side cursor, EXPORT_BATCH_SIZE at a time, without comments or
+        attachments. The response has no Content-Length and ends when the
+        connection closes.
+        """
+        query_params = parse_qs(parsed_path.query)
+        user_id = int(self.headers.get("X-User-Id", "0"))
+        fmt = query_params.get("format", ["ndjson"])[0].lower()
+        if fmt not in ("ndjson", "csv"):
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": "format must be ndjson or csv"}))
+            return
+        try:
+            conditions, params = build_task_filters(query_params, user_id)
+        except ValueError as ve:
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": f"Invalid filter: {ve}"}))
+            return
+
+        query = f"SELECT {', '.join('t.' + c for c in EXPORT_COLUMNS)} FROM tasks t"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY t.id"
+
+        with closing(stream_query(query, params)) as batches:
+            try:
+                first = next(batches, [])
             except Exception as e:
+                print(f"Error in handle_task_export: {e}")
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode('utf-8'))
-        else:
-            self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "File not found"}).encode('utf-8'))
+                self.wfile.write(json_bytes({"error": str(e)}))
+                return
+
+            encoding = choose_encoding(self.headers.get("Accept-Encoding"))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson")
+            self.send_header("Content-Disposition", f'attachment; filename="tasks.{fmt}"')
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Vary", "Accept-Encoding")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.send_header("Connection", "close") # no Content-Length: the body ends with the connection
+            self.end_headers()
+            compress, finish = stream_compressor(encoding) if encoding else (lambda data: data, lambda: b"")
+
+            text = io.StringIO()
+            writer = csv.writer(text)
+            if fmt == "csv":
+                writer.writerow(EXPORT_COLUMNS)
+
+            def encode(rows):
+                if fmt == "ndjson":
+                    return b"".join(json_bytes(row) + b"\n" for row in rows)
+                writer.writerows([_csv_cell(row[c]) for c in EXPORT_COLUMNS] for row in rows)
+                data = text.getvalue().encode("utf-8")
+                text.seek(0)
+                text.truncate()
+                return data
+
+            try:
+                batch = first
+                while True:
+                    chunk = compress(encode(batch))
+                    if chunk:
+                        self.wfile.write(chunk)
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                self.wfile.write(finish())
+            except (BrokenPipeError, ConnectionResetError):
+                pass # client went away; closing() drains the cursor
+            except Exception as e:
+                # Headers are out; all we can do is cut the stream short
+                print(f"Error in handle_task_export: {e}")
+
+    def handle_task_import(self, parsed_path):
+        """POST /tasks/import?format=ndjson|csv with the raw file as the body.
+
+        Each record takes the POST /tasks fields (CSV: a header row naming them).
+        The body is parsed line by line and valid rows are inserted in multi-row
+        INSERTs of IMPORT_BATCH_SIZE, each batch committed as it fills. Invalid
+        rows are skipped and reported by line number.
+        """
+        query_params = parse_qs(parsed_path.query)
+        fmt = query_params.get("format", ["csv" if "csv" in self.headers.get("Content-Type", "") else "ndjson"])[0].lower()
+        if fmt not in ("ndjson", "csv"):
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": "format must be ndjson or csv"}))
+            return
+        created_by = int(self.headers.get("X-User-Id", "0"))
+        if not created_by:
+            self._set_headers(401)
+            self.wfile.write(json_bytes({"error": "Unauthorized: X-User-Id header missing"}))
+            return
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            self.close_connection = True
+            self._set_headers(411)
+            self.wfile.write(json_bytes({"error": "Content-Length is required"}))
+            return
+
+        imported, failed, errors = 0, 0, []
+        known_teams = set()
+        batch = []
+
+        def fail(line, message):
+            nonlocal failed
+            failed += 1
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append({"line": line, "error": message})
+
+        def flush():
+            nonlocal imported
+            team_ids = {row[5] for _, row in batch} - known_teams
+            if team_ids:
+                found = execute_query(f"SELECT id FROM teams WHERE id IN ({','.join(['%s'] * len(team_ids))})",
+                                      tuple(team_ids), fetch_all=True, dictionary=False)
+                known_teams.update(row[0] for row in found)
+            rows = []
+            for line, row in batch:
+                if row[5] in known_teams:
+                    rows.append(row)
+                else:
+                    fail(line, "Team not found")
+            if rows:
+                with transaction():
+                    execute_many(
+                        "INSERT INTO tasks (title, description, status, priority, due_date, team_id, created_by, assigned_to) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                        rows
+                    )
+                imported += len(rows)
+            batch.clear()
+
+        try:
+            for line, record in import_rows(_body_lines(self.rfile, length), fmt):
+                if isinstance(record, str):
+                    fail(line, record)
+                    continue
+                if not all(record.get(f) for f in ("title", "description", "team_id")):
+                    fail(line, "Missing required fields (title, description, team_id)")
+                    continue
+                try:
+                    fields = parse_task_updates(record, TASK_UPDATE_FIELDS)
+                except ValueError as ve:
+                    fail(line, str(ve))
+                    continue
+                batch.append((line, (fields["title"], fields["description"], fields.get("status", "TODO"),
+                                     fields.get("priority", "MEDIUM"), fields.get("due_date"), fields["team_id"],
+                                     created_by, fields.get("assigned_to"))))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    flush()
+            if batch:
+                flush()
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            # The rest of the body can't be parsed (or wasn't read): stop here
+            self.close_connection = True
+            fail(None, f"Import stopped: {e}")
+        except Exception as e:
+            print(f"Error in handle_task_import: {e}")
+            self.close_connection = True
+            self._set_headers(500)
+            self.wfile.write(json_bytes({"error": str(e), "imported": imported}))
+            return
+        finally:
+            if imported:
+                bump_versions("tasks")
+
+        self._set_headers(200)
+        self.wfile.write(json_bytes({"imported": imported, "failed": failed, "errors": errors}))
+
+    def handle_task_search(self, parsed_path):
+        """GET /tasks/search?q=: tasks ranked by full-text relevance.
+
+        Matches words (as prefixes) in a task's title and description or in its
+        comments. Takes the GET /tasks filters (teamId, mine, status, ...) and
+        limit/cursor; results carry a "score" and no embedded comments.
+        """
+        query_params = parse_qs(parsed_path.query)
+        user_id = int(self.headers.get("X-User-Id", "0"))
+
+        terms = fulltext_query(query_params.get("q", [""])[0])
+        if not terms:
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": "q must contain at least one word"}))
+            return
+
+        try:
+            conditions, params = build_task_filters(query_params, user_id)
+        except ValueError as ve:
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": f"Invalid filter: {ve}"}))
+            return
+        try:
+            limit = min(int(query_params.get("limit", [DEFAULT_PAGE_SIZE])[0]), MAX_PAGE_SIZE)
+            offset = decode_offset_cursor(query_params["cursor"][0]) if "cursor" in query_params else 0
+            if limit < 1 or not 0 <= offset <= MAX_SEARCH_OFFSET:
+                raise ValueError("out of range")
+        except (ValueError, TypeError, UnicodeError):
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": "Invalid limit or cursor"}))
+            return
+
+        etag = listing_etag(self, ("tasks", "comments", "teams"))
+        if self._not_modified(etag):
+            return
+
+        try:
+            # Both MATCHes are served by their FULLTEXT indexes; the filters then
+            # apply to the (usually small) set of matching tasks
+            query = """
+                SELECT t.*, hits.score
+                FROM (
+                    SELECT task_id, SUM(score) AS score FROM (
+                        SELECT id AS task_id, %s * MATCH(title, description) AGAINST (%s IN BOOLEAN MODE) AS score
+                        FROM tasks WHERE MATCH(title, description) AGAINST (%s IN BOOLEAN MODE)
+                        UNION ALL
+                        SELECT task_id, MATCH(content) AGAINST (%s IN BOOLEAN MODE)
+                        FROM comments WHERE MATCH(content) AGAINST (%s IN BOOLEAN MODE)
+                    ) matches
+                    GROUP BY task_id
+                ) hits
+                JOIN tasks t ON t.id = hits.task_id
+            """
+            query_args = [SEARCH_TASK_WEIGHT, terms, terms, terms, terms]
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+                query_args.extend(params)
+            # One extra row tells us whether another page exists
+            query += " ORDER BY hits.score DESC, t.id DESC LIMIT %s OFFSET %s"
+            query_args.extend([limit + 1, offset])
+            tasks_data = execute_query(query, query_args, fetch_all=True, dictionary=True)
+
+            response = {"tasks": tasks_data[:limit]}
+            if len(tasks_data) > limit and offset + limit <= MAX_SEARCH_OFFSET:
+                response["next_cursor"] = encode_offset_cursor(offset + limit)
+
+            self._set_headers(200, etag=etag)
+            self.wfile.write(json_bytes(response))
+        except Exception as e:
+            print(f"Error in handle_task_search: {e}")
+            self._set_headers(500)
+            self.wfile.write(json_bytes({"error": str(e)}))
+
+    def handle_task_stats(self, parsed_path):
+        """GET /tasks/stats: task counts for the dashboard, without the tasks themselves.
+
+        Takes the same filters as GET /tasks. Counts are broken down by status and
+        priority overall, per team and per assignee; "overdue" counts unfinished
+        tasks whose due date has passed. "teams" has the caller's team count
+        (leader or member) next to the total.
+        """
+        query_params = parse_qs(parsed_path.query)
+        user_id = int(self.headers.get("X-User-Id", "0"))
+
+        # The overdue counts change at midnight without any write, so the date is part of the key
+        etag = listing_etag(self, ("tasks", "teams"), extra=date.today().isoformat())
+        if self._not_modified(etag):
+            return
+
+        try:
+            conditions, params = build_task_filters(query_params, user_id)
+        except ValueError as ve:
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": f"Invalid filter: {ve}"}))
+            return
+
+        try:
+            # One pass over the stats indexes; the breakdowns are folded together below
+            query = """
+                SELECT t.team_id, t.assigned_to, COALESCE(t.status, 'TODO') AS status,
+                       COALESCE(t.priority, 'MEDIUM') AS priority, COUNT(*) AS count,
+                       SUM(COALESCE(t.status, 'TODO') <> 'DONE' AND t.due_date < CURDATE()) AS overdue
+                FROM tasks t
+            """
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            # NULL status/priority (rows written before creates were validated) count as the
+            # column defaults, so a NULL group and a TODO group may both fold into "TODO"
+            query += " GROUP BY t.team_id, t.assigned_to, t.status, t.priority"
+            groups = execute_query(query, params, fetch_all=True, dictionary=True)
+
+            def empty():
+                return {"total": 0, "overdue": 0,
+                        "by_status": dict.fromkeys(TASK_STATUSES, 0),
+                        "by_priority": dict.fromkeys(TASK_PRIORITIES, 0)}
+
+            totals, by_team, by_assignee = empty(), {}, {}
+            for row in groups:
+                count, overdue = int(row["count"]), int(row["overdue"] or 0)
+                for bucket in (totals,
+                               by_team.setdefault(row["team_id"], empty()),
+                               by_assignee.setdefault(row["assigned_to"], empty())):
+                    bucket["total"] += count
+                    bucket["overdue"] += overdue
+                    bucket["by_status"][row["status"]] += count
+                    bucket["by_priority"][row["priority"]] += count
+
+            teams = execute_query(
+                """
+                SELECT COUNT(*) AS total,
+                       SUM(te.leader_id = %s OR EXISTS (SELECT 1 FROM team_members m WHERE m.team_id = te.id AND m.user_id = %s)) AS mine
+                FROM teams te
+                """,
+                (user_id, user_id), fetch_one=True, dictionary=True)
+
+            totals["by_team"] = [dict(team_id=team_id, **bucket) for team_id, bucket in by_team.items()]
+            # assigned_to is None for the unassigned bucket
+            totals["by_assignee"] = [dict(user_id=assignee, **bucket) for assignee, bucket in by_assignee.items()]
+            totals["teams"] = {"mine": int(teams["mine"] or 0), "total": int(teams["total"])}
+
+            self._set_headers(200, etag=etag)
+            self.wfile.write(json_bytes(totals))
+        except Exception as e:
+            print(f"Error in handle_task_stats: {e}")
+            self._set_headers(500)
+            self.wfile.write(json_bytes({"error": str(e)}))
 
     def handle_get_tasks(self, parsed_path):
         try:
@@ -170,16 +1976,55 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
             token = self.headers.get("Authorization", "").split(" ")[-1]
             user_id = int(self.headers.get("X-User-Id", 0))
             user_role = self.headers.get("X-User-Role", "MEMBER")
+
+            # Listings embed comments, attachments and user/team details
+            etag = listing_etag(self, ("tasks", "comments", "attachments", "users", "teams"))
+            if self._not_modified(etag):
+                return
             
             query = "SELECT t.* FROM tasks t"
             params = []
+            # Pagination is opt-in so existing callers that expect the full list keep working
+            paginate = 'limit' in query_params or 'cursor' in query_params
+            limit = None
+            since = None
 
             if path == '/tasks':
-                conditions = []
-                if 'teamId' in query_params:
-                    conditions.append("t.team_id = %s")
-                    params.append(int(query_params['teamId'][0]))
-                
+                try:
+                    conditions, params = build_task_filters(query_params, user_id)
+                except ValueError as ve:
+                    self._set_headers(400)
+                    self.wfile.write(json_bytes({"error": f"Invalid filter: {ve}"}))
+                    return
+
+                if 'since' in query_params:
+                    try:
+                        since = parse_since(query_params['since'][0])
+                    except ValueError:
+                        self._set_headers(400)
+                        self.wfile.write(json_bytes({"error": "Invalid since, expected an ISO 8601 timestamp"}))
+                        return
+                    sync_token = new_sync_token()
+                    since, reset = sync_since(since)
+                    conditions.append("t.updated_at >= %s")
+                    params.append(since)
+
+                if paginate:
+                    try:
+                        limit = int(query_params.get('limit', [DEFAULT_PAGE_SIZE])[0])
+                        if limit < 1:
+                            raise ValueError("limit must be positive")
+                        limit = min(limit, MAX_PAGE_SIZE)
+                        if 'cursor' in query_params:
+                            cursor_created_at, cursor_id = decode_cursor(query_params['cursor'][0])
+                            # Keyset on (created_at, id): rows strictly after the last one returned
+                            conditions.append("(t.created_at < %s OR (t.created_at = %s AND t.id < %s))")
+                            params.extend([cursor_created_at, cursor_created_at, cursor_id])
+                    except (ValueError, TypeError):
+                        self._set_headers(400)
+                        self.wfile.write(json_bytes({"error": "Invalid limit or cursor"}))
+                        return
+
                 if conditions:
                     query += " WHERE " + " AND ".join(conditions)
                     
@@ -194,7 +2039,7 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
                         params.append(task_id)
                     except ValueError:
                          self._set_headers(404)
-                         self.wfile.write(json.dumps({"error": "Invalid task ID format"}).encode("utf-8"))
+                         self.wfile.write(json_bytes({"error": "Invalid task ID format"}))
                          return
                 else:
                     # Could be /tasks/1/comments etc, but handle_get_tasks shouldn't be called for those if routed properly?
@@ -202,19 +2047,30 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
                     # But wait, comments/attachments are sub-resources but typically GET /tasks/{id} returns them embedded.
                     # So we just need to match /tasks/{id} exactly here.
                     self._set_headers(404)
-                    self.wfile.write(json.dumps({"error": "Invalid task path structure"}).encode("utf-8"))
+                    self.wfile.write(json_bytes({"error": "Invalid task path structure"}))
                     return
             else:
                 self._set_headers(404)
-                self.wfile.write(json.dumps({"error": "Invalid task path"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid task path"}))
                 return
 
-            # Fetch tasks
-            tasks_data = execute_query(query + " ORDER BY t.created_at DESC", params, fetch_all=True, dictionary=True)
+            # Fetch tasks; id breaks ties between tasks created in the same second
+            query += " ORDER BY t.created_at DESC, t.id DESC"
+            if limit is not None:
+                # One extra row tells us whether another page exists
+                query += " LIMIT %s"
+                params.append(limit + 1)
+            tasks_data = execute_query(query, params, fetch_all=True, dictionary=True)
+
+            next_cursor = None
+            if limit is not None and len(tasks_data) > limit:
+                tasks_data = tasks_data[:limit]
+                last = tasks_data[-1]
+                next_cursor = encode_cursor(last['created_at'], last['id'])
             
             if not tasks_data and path != '/tasks': # If fetching single task and not found
                 self._set_headers(404)
-                self.wfile.write(json.dumps({"error": "Task not found"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Task not found"}))
                 return
 
             # Fetch related data (users, teams, comments, attachments) if needed
@@ -246,11 +2102,11 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
                     if task.get('created_by'): user_ids_to_fetch.add(task['created_by'])
                     if task.get('assigned_to'): user_ids_to_fetch.add(task['assigned_to'])
                 
-                user_map = get_user_details(list(user_ids_to_fetch), handler=self)
-
                 # Fetch team details
                 team_ids_to_fetch = set(t['team_id'] for t in tasks_data if t.get('team_id'))
-                team_map = get_team_details(list(team_ids_to_fetch), handler=self)
+
+                # Both lookups go out at the same time
+                user_map, team_map = get_user_and_team_details(list(user_ids_to_fetch), list(team_ids_to_fetch), handler=self)
 
                 # Assemble final data
                 for task in tasks_data:
@@ -263,21 +2119,35 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
             # If GET /tasks/{id}, return single task
             if path != '/tasks' and tasks_data:
                 task_data = tasks_data[0]
-                self._set_headers(200)
-                self.wfile.write(json.dumps(task_data, default=str).encode("utf-8"))
+                self._set_headers(200, etag=etag)
+                self.wfile.write(json_bytes(task_data))
+            elif since is not None: # GET /tasks?since=, changes only
+                body = {"tasks": tasks_data, "deleted": [] if reset else deleted_since("tasks", since),
+                        "reset": reset, "sync_token": sync_token}
+                if paginate:
+                    body["next_cursor"] = next_cursor
+                self._set_headers(200, etag=etag)
+                self.wfile.write(json_bytes(body))
+            elif paginate: # GET /tasks?limit=&cursor=, return one page
+                self._set_headers(200, etag=etag)
+                self.wfile.write(json_bytes({"tasks": tasks_data, "next_cursor": next_cursor}))
             else: # GET /tasks, return list
-                self._set_headers(200)
-                self.wfile.write(json.dumps(tasks_data, default=str).encode("utf-8"))
+                self._set_headers(200, etag=etag)
+                self.wfile.write(json_bytes(tasks_data))
         except Exception as e:
             print(f"Error in handle_get_tasks: {e}")
             self._set_headers(500)
-            self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": str(e)}))
 
     def do_POST(self):
         parsed_path = urlparse(self.path)
         path = parsed_path.path
         
-        if path.startswith('/tasks/'):
+        if path == "/tasks/bulk":
+            self.handle_bulk_create()
+        elif path == "/tasks/import":
+            self.handle_task_import(parsed_path)
+        elif path.startswith('/tasks/'):
             if path.endswith('/attachments'):
                 self.handle_attachment_upload(path)
             elif path.endswith('/comments'):
@@ -286,9 +2156,33 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
                 self.handle_task_creation()
         elif path == "/tasks":
              self.handle_task_creation()
+        elif path == "/cache/invalidate":
+            self.handle_cache_invalidation()
         else:
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
+
+    def handle_cache_invalidation(self):
+        # Called by user-service / team-service after a write: {"users": [ids], "teams": [ids]}.
+        # A key with null drops the whole cache.
+        if not is_internal_call(self.headers):
+            # A user token is not enough: flushing the caches on demand is for the services only
+            self._set_headers(403)
+            self.wfile.write(json_bytes({"error": "Forbidden: internal endpoint"}))
+            return
+        data = parse_request_body(self)
+        if data is None:
+            return
+        try:
+            for key, cache in (("users", user_cache), ("teams", team_cache)):
+                if key in data:
+                    cache.invalidate(None if data[key] is None else [int(x) for x in data[key]])
+        except (TypeError, ValueError):
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": "Expected lists of ids"}))
+            return
+        self._set_headers(200)
+        self.wfile.write(json_bytes({"status": "ok"}))
 
     def handle_task_creation(self):
         data = parse_request_body(self)
@@ -298,13 +2192,20 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
         required_fields = ["title", "description", "team_id"]
         if not all(field in data and data[field] for field in required_fields):
             self._set_headers(400)
-            self.wfile.write(json.dumps({"error": "Missing required fields (title, description, team_id)"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Missing required fields (title, description, team_id)"}))
+            return
+        # Same checks as bulk create and import: enum values are validated and null means "default"
+        try:
+            fields = parse_task_updates(data, TASK_UPDATE_FIELDS)
+        except ValueError as ve:
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": str(ve)}))
             return
 
         created_by = int(self.headers.get("X-User-Id", "0"))
         if not created_by:
             self._set_headers(401)
-            self.wfile.write(json.dumps({"error": "Unauthorized: X-User-Id header missing"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Unauthorized: X-User-Id header missing"}))
             return
         
         try:
@@ -314,35 +2215,37 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                 """,
                 (
-                    data["title"],
-                    data["description"],
-                    data.get("status", "TODO"),
-                    data.get("priority", "MEDIUM"),
-                    data.get("due_date"),
-                    data["team_id"],
+                    fields["title"],
+                    fields["description"],
+                    fields.get("status", "TODO"),
+                    fields.get("priority", "MEDIUM"),
+                    fields.get("due_date"),
+                    fields["team_id"],
                     created_by,
-                    data.get("assigned_to")
+                    fields.get("assigned_to")
                 )
             )
             task_id = inserted_task.get("lastrowid")
+            bump_versions("tasks")
 
             # Fetch the newly created task to return
             new_task = execute_query("SELECT * FROM tasks WHERE id=%s", (task_id,), fetch_one=True, dictionary=True)
+            event_hub.publish("task.created", new_task, new_task["team_id"], (new_task["created_by"], new_task["assigned_to"]))
             
             self._set_headers(201)
-            self.wfile.write(json.dumps(new_task, default=str).encode("utf-8"))
+            self.wfile.write(json_bytes(new_task))
 
         except Exception as e:
             print(f"Error in handle_task_creation: {e}")
             self._set_headers(500)
-            self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": str(e)}))
 
     def handle_comment_creation(self, path):
         try:
             task_id = int(path.split('/')[-2])
         except (IndexError, ValueError):
             self._set_headers(400)
-            self.wfile.write(json.dumps({"error": "Invalid task ID in path"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Invalid task ID in path"}))
             return
         
         data = parse_request_body(self)
@@ -354,11 +2257,11 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
 
         if not content:
             self._set_headers(400)
-            self.wfile.write(json.dumps({"error": "Comment content is required"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Comment content is required"}))
             return
         if not author_id:
             self._set_headers(401)
-            self.wfile.write(json.dumps({"error": "Unauthorized: X-User-Id header missing"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Unauthorized: X-User-Id header missing"}))
             return
         
         try:
@@ -371,24 +2274,28 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
                 (task_id, author_id, content, author_username)
             )
             comment_id = inserted_comment.get("lastrowid")
+            # Tasks embed their comments, so the task counts as changed for ?since= sync
+            execute_query("UPDATE tasks SET updated_at = CURRENT_TIMESTAMP(6) WHERE id=%s", (task_id,))
+            bump_versions("comments")
 
             # Fetch the newly created comment to return
             new_comment = execute_query("SELECT c.*, u.username as author_username FROM comments c LEFT JOIN users u ON c.author_id = u.id WHERE c.id=%s", (comment_id,), fetch_one=True, dictionary=True)
+            publish_task_event("comment.created", new_comment, task_id)
             
             self._set_headers(201)
-            self.wfile.write(json.dumps(new_comment, default=str).encode("utf-8"))
+            self.wfile.write(json_bytes(new_comment))
 
         except Exception as e:
             print(f"Error in handle_comment_creation: {e}")
             self._set_headers(500)
-            self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": str(e)}))
 
     def handle_attachment_upload(self, path):
         try:
             task_id = int(path.split('/')[-2])
         except (IndexError, ValueError):
             self._set_headers(400)
-            self.wfile.write(json.dumps({"error": "Invalid task ID in path"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Invalid task ID in path"}))
             return
         
         content_type = self.headers.get('Content-Type', '')
@@ -396,49 +2303,279 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
         
         if 'multipart/form-data' not in content_type:
             self._set_headers(415)
-            self.wfile.write(json.dumps({"error": f"Unsupported Media Type, must be multipart/form-data. Received: {content_type}"}).encode('utf-8'))
+            self.wfile.write(json_bytes({"error": f"Unsupported Media Type, must be multipart/form-data. Received: {content_type}"}))
             return
 
+        boundary = self.headers.get_param('boundary', header='content-type')
         try:
-            length = int(self.headers.get('Content-Length', 0))
-            # Use FieldStorage which handles the multipart parsing
-            fs = cgi.FieldStorage(fp=self.rfile, headers=self.headers, environ={'REQUEST_METHOD':'POST', 'CONTENT_TYPE': content_type})
-            
-            filefield = fs['file'] if 'file' in fs else None
-            if filefield is None or not filefield.filename:
+            length = int(self.headers['Content-Length'])
+        except (TypeError, ValueError):
+            length = -1
+        if not boundary or length < 0:
+            self.close_connection = True
+            self._set_headers(400 if length >= 0 else 411)
+            self.wfile.write(json_bytes({"error": "Multipart boundary and Content-Length are required"}))
+            return
+        if length > MAX_UPLOAD_SIZE + MAX_FORM_FIELD_SIZE:
+            # Refuse before reading anything; the unread body means the connection can't be reused
+            self.close_connection = True
+            self._set_headers(413)
+            self.wfile.write(json_bytes({"error": f"Attachment exceeds the {MAX_UPLOAD_SIZE} byte limit"}))
+            return
+
+        upload = None
+        try:
+            try:
+                fields, upload = receive_multipart_upload(self.rfile, length, boundary.encode('latin-1'))
+            except UploadTooLarge:
+                self.close_connection = True
+                self._set_headers(413)
+                self.wfile.write(json_bytes({"error": f"Attachment exceeds the {MAX_UPLOAD_SIZE} byte limit"}))
+                return
+            except MultipartError as e:
+                self.close_connection = True
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "No file provided in 'file' field"}).encode('utf-8'))
+                self.wfile.write(json_bytes({"error": str(e)}))
                 return
-            
-            filename = os.path.basename(filefield.filename)
-            ext = os.path.splitext(filename)[1]
-            safe_name = f"{uuid.uuid4().hex}{ext}"
-            uploads_dir = os.path.join(os.path.dirname(__file__), 'uploads')
-            os.makedirs(uploads_dir, exist_ok=True)
-            filepath = os.path.join(uploads_dir, safe_name)
-
-            with open(filepath, 'wb') as out:
-                out.write(filefield.file.read())
-            
-            url = f"/files/{safe_name}"
-            author_id = int(self.headers.get('X-User-Id', 0))
-            original_name = fs.getvalue('original_name', filename) # Use provided original_name if available
 
-            inserted_attachment = execute_query(
-                "INSERT INTO attachments (task_id, author_id, url, original_name) VALUES (%s, %s, %s, %s)",
-                (task_id, author_id, url, original_name)
-            )
-            attachment_id = inserted_attachment.get("lastrowid")
+            if upload is None:
+                self._set_headers(400)
+                self.wfile.write(json_bytes({"error": "No file provided in 'file' field"}))
+                return
+
+            author_id = int(self.headers.get('X-User-Id', 0))
+            original_name = fields.get('original_name') or upload.filename # Use provided original_name if available
+            attachment_id = save_attachment(upload, task_id, author_id, original_name)
 
             # Fetch the newly created attachment to return
             new_attachment = execute_query("SELECT * FROM attachments WHERE id=%s", (attachment_id,), fetch_one=True, dictionary=True)
+            # Previews are rendered in the background; the upload returns right away
+            schedule_thumbnails(os.path.basename(new_attachment['url']))
+            publish_task_event("attachment.created", new_attachment, task_id)
             
             self._set_headers(201)
-            self.wfile.write(json.dumps(new_attachment, default=str).encode('utf-8'))
+            self.wfile.write(json_bytes(new_attachment))
         except Exception as e:
             print(f"Error in handle_attachment_upload: {e}")
             self._set_headers(500)
-            self.wfile.write(json.dumps({"error": str(e)}).encode('utf-8'))
+            self.wfile.write(json_bytes({"error": str(e)}))
+        finally:
+            if upload is not None:
+                upload.discard()
+
+    # Bulk endpoints: POST/PUT/DELETE /tasks/bulk take an array, check every item
+    # against one lookup of the tasks and teams involved, and apply the valid ones
+    # in a single transaction. The response lists a result per item, in order:
+    # {"index", "status", "task"} or {"index", "status", "error"}; invalid items
+    # are skipped without failing the rest.
+    def _bulk_items(self, key):
+        data = parse_request_body(self)
+        if data is None:
+            return None
+        items = data.get(key) if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            self._set_headers(400)
+            self.wfile.write(json_bytes({"error": f"Body must be {{\"{key}\": [...]}} with at least one item"}))
+            return None
+        if len(items) > BULK_MAX_ITEMS:
+            self._set_headers(413)
+            self.wfile.write(json_bytes({"error": f"At most {BULK_MAX_ITEMS} items per request"}))
+            return None
+        return items
+
+    def handle_bulk_create(self):
+        """POST /tasks/bulk {"tasks": [{...POST /tasks fields...}, ...]}"""
+        items = self._bulk_items("tasks")
+        if items is None:
+            return
+        created_by = int(self.headers.get("X-User-Id", "0"))
+        if not created_by:
+            self._set_headers(401)
+            self.wfile.write(json_bytes({"error": "Unauthorized: X-User-Id header missing"}))
+            return
+
+        try:
+            results = [None] * len(items)
+            parsed = []
+            for index, item in enumerate(items):
+                if not isinstance(item, dict) or not all(item.get(f) for f in ("title", "description", "team_id")):
+                    results[index] = {"index": index, "status": 400, "error": "Missing required fields (title, description, team_id)"}
+                    continue
+                try:
+                    parsed.append((index, parse_task_updates(item, TASK_UPDATE_FIELDS)))
+                except ValueError as ve:
+                    results[index] = {"index": index, "status": 400, "error": str(ve)}
+
+            team_ids = sorted({fields["team_id"] for _, fields in parsed})
+            known_teams = set()
+            if team_ids:
+                found = execute_query(f"SELECT id FROM teams WHERE id IN ({','.join(['%s'] * len(team_ids))})",
+                                      tuple(team_ids), fetch_all=True, dictionary=False)
+                known_teams = {row[0] for row in found}
+
+            rows, indexes = [], []
+            for index, fields in parsed:
+                if fields["team_id"] not in known_teams:
+                    results[index] = {"index": index, "status": 404, "error": "Team not found"}
+                    continue
+                rows.append((fields["title"], fields["description"], fields.get("status", "TODO"), fields.get("priority", "MEDIUM"),
+                             fields.get("due_date"), fields["team_id"], created_by, fields.get("assigned_to")))
+                indexes.append(index)
+
+            created = []
+            if rows:
+                task_ids = []
+                with transaction():
+                    # One INSERT per row: a multi-row INSERT's ids are only consecutive with
+                    # innodb_autoinc_lock_mode < 2, and each row's lastrowid is needed
+                    for row in rows:
+                        task_ids.append(execute_query(
+                            "INSERT INTO tasks (title, description, status, priority, due_date, team_id, created_by, assigned_to) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                            row
+                        )["lastrowid"])
+                    bump_versions("tasks")
+                created = execute_query(f"SELECT * FROM tasks WHERE id IN ({','.join(['%s'] * len(task_ids))})",
+                                        tuple(task_ids), fetch_all=True, dictionary=True)
+                by_id = {task["id"]: task for task in created}
+                for index, task_id in zip(indexes, task_ids):
+                    results[index] = {"index": index, "status": 201, "task": by_id.get(task_id)}
+
+            for task in created:
+                event_hub.publish("task.created", task, task["team_id"], (task["created_by"], task["assigned_to"]))
+
+            self._set_headers(200)
+            self.wfile.write(json_bytes({"results": results}))
+        except Exception as e:
+            print(f"Error in handle_bulk_create: {e}")
+            self._set_headers(500)
+            self.wfile.write(json_bytes({"error": str(e)}))
+
+    def _bulk_tasks(self, items, key):
+        """Map each valid integer id found under key in items to its task row (with leader_id)."""
+        ids = sorted({item.get(key) for item in items if isinstance(item, dict) and _is_task_id(item.get(key))})
+        if not ids:
+            return {}
+        rows = execute_query(
+            f"SELECT t.*, te.leader_id FROM tasks t LEFT JOIN teams te ON t.team_id = te.id WHERE t.id IN ({','.join(['%s'] * len(ids))})",
+            tuple(ids), fetch_all=True, dictionary=True)
+        return {row["id"]: row for row in rows}
+
+    def handle_bulk_update(self):
+        """PUT /tasks/bulk {"tasks": [{"id": 1, ...PUT /tasks/<id> fields...}, ...]}"""
+        items = self._bulk_items("tasks")
+        if items is None:
+            return
+        role = self.headers.get("X-User-Role", "MEMBER")
+        user_id = int(self.headers.get("X-User-Id", "0"))
+
+        try:
+            current = self._bulk_tasks(items, "id")
+            results = [None] * len(items)
+            # Rows that change the same set of columns share one UPDATE statement
+            statements = {}
+            updated = []
+            for index, item in enumerate(items):
+                if not isinstance(item, dict) or not _is_task_id(item.get("id")):
+                    results[index] = {"index": index, "status": 400, "error": "Each item needs an integer id"}
+                    continue
+                task = current.get(item["id"])
+                if task is None:
+                    results[index] = {"index": index, "status": 404, "error": "Task not found"}
+                    continue
+                allowed_fields = task_update_permissions(task, role, user_id)
+                if allowed_fields is None:
+                    results[index] = {"index": index, "status": 403, "error": "Forbidden: insufficient permissions"}
+                    continue
+                try:
+                    updates = parse_task_updates(item, allowed_fields)
+                except ValueError as ve:
+                    results[index] = {"index": index, "status": 400, "error": str(ve)}
+                    continue
+                if not updates:
+                    results[index] = {"index": index, "status": 400, "error": "No valid fields provided for update"}
+                    continue
+                statements.setdefault(tuple(updates), []).append((*updates.values(), task["id"]))
+                updated.append((index, task["id"]))
+
+            fresh = {}
+            if updated:
+                task_ids = sorted({task_id for _, task_id in updated})
+                with transaction():
+                    for fields, rows in statements.items():
+                        set_clause = ", ".join(f"{field}=%s" for field in fields)
+                        execute_many(f"UPDATE tasks SET {set_clause} WHERE id=%s", rows)
+                    bump_versions("tasks")
+                    fresh = {task["id"]: task for task in execute_query(
+                        f"SELECT * FROM tasks WHERE id IN ({','.join(['%s'] * len(task_ids))})",
+                        tuple(task_ids), fetch_all=True, dictionary=True)}
+                for index, task_id in updated:
+                    results[index] = {"index": index, "status": 200, "task": fresh.get(task_id)}
+
+            for task_id, task in fresh.items():
+                before = current[task_id]
+                event_hub.publish("task.updated", task, task["team_id"],
+                                  (task["created_by"], task["assigned_to"], before["assigned_to"]))
+                if before["team_id"] != task["team_id"]:
+                    event_hub.publish("task.updated", task, before["team_id"])
+
+            self._set_headers(200)
+            self.wfile.write(json_bytes({"results": results}))
+        except Exception as e:
+            print(f"Error in handle_bulk_update: {e}")
+            self._set_headers(500)
+            self.wfile.write(json_bytes({"error": str(e)}))
+
+    def handle_bulk_delete(self):
+        """DELETE /tasks/bulk {"ids": [1, 2, ...]}"""
+        ids = self._bulk_items("ids")
+        if ids is None:
+            return
+        role = self.headers.get("X-User-Role", "MEMBER")
+        user_id = int(self.headers.get("X-User-Id", "0"))
+
+        try:
+            current = self._bulk_tasks([{"id": task_id} for task_id in ids], "id")
+            results = [None] * len(ids)
+            deleted = []
+            for index, task_id in enumerate(ids):
+                if not _is_task_id(task_id):
+                    results[index] = {"index": index, "id": task_id, "status": 400, "error": "ids must be integers"}
+                    continue
+                task = current.get(task_id)
+                if task is None:
+                    results[index] = {"index": index, "id": task_id, "status": 404, "error": "Task not found"}
+                elif not can_delete_task(task, role, user_id):
+                    results[index] = {"index": index, "id": task_id, "status": 403, "error": "Forbidden: insufficient permissions to delete this task"}
+                else:
+                    results[index] = {"index": index, "id": task_id, "status": 200}
+                    if task_id not in deleted:
+                        deleted.append(task_id)
+
+            if deleted:
+                placeholders = ','.join(['%s'] * len(deleted))
+                removed_files = execute_query(f"SELECT DISTINCT url, content_hash FROM attachments WHERE task_id IN ({placeholders})",
+                                              tuple(deleted), fetch_all=True, dictionary=False)
+                with transaction():
+                    execute_query(f"DELETE FROM tasks WHERE id IN ({placeholders})", tuple(deleted))
+                    execute_many("INSERT INTO tombstones (entity, entity_id) VALUES ('tasks', %s)", [(task_id,) for task_id in deleted])
+                    bump_versions("tasks") # comments/attachments go with them through ON DELETE CASCADE
+
+                if removed_files:
+                    try:
+                        collect_attachment_files(removed_files)
+                    except Exception as e:
+                        print(f"Error collecting attachment files for tasks {deleted}: {e}")
+
+                for task_id in deleted:
+                    task = current[task_id]
+                    event_hub.publish("task.deleted", {"id": task_id}, task["team_id"], (task["created_by"], task["assigned_to"]))
+
+            self._set_headers(200)
+            self.wfile.write(json_bytes({"results": results}))
+        except Exception as e:
+            print(f"Error in handle_bulk_delete: {e}")
+            self._set_headers(500)
+            self.wfile.write(json_bytes({"error": str(e)}))
 
     def do_PUT(self):
         parsed_path = urlparse(self.path)
@@ -446,7 +2583,11 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
         
         if not path.startswith("/tasks/"):
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
+            return
+
+        if path == "/tasks/bulk":
+            self.handle_bulk_update()
             return
 
         try:
@@ -462,58 +2603,26 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
             current_task = execute_query("SELECT t.*, te.leader_id FROM tasks t JOIN teams te ON t.team_id = te.id WHERE t.id=%s", (task_id,), fetch_one=True, dictionary=True)
             if not current_task:
                 self._set_headers(404)
-                self.wfile.write(json.dumps({"error": "Task not found"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Task not found"}))
                 return
 
-            is_admin = (role == 'ADMIN')
-            is_leader = (role == 'TEAM_LEADER' and current_task.get('leader_id') == user_id)
-            is_assignee = (current_task.get('assigned_to') is not None and current_task.get('assigned_to') == user_id)
-            is_creator = (current_task.get('created_by') == user_id)
-
             # Determine which fields are updatable by the current user
-            allowed_fields = {}
-            if is_admin or is_leader:
-                allowed_fields = {
-                    'title': str, 'description': str, 'status': str, 
-                    'priority': str, 'due_date': str, 'assigned_to': int, 'team_id': int
-                }
-            elif is_assignee:
-                allowed_fields = {'status': str} # Assignee can only change status
-            elif is_creator: # Creator might have more permissions, but for simplicity, let's stick to assignee/admin/leader roles for now
-                 allowed_fields = {} # Or define specific creator permissions if needed
-            else:
+            allowed_fields = task_update_permissions(current_task, role, user_id)
+            if allowed_fields is None:
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Forbidden: insufficient permissions"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Forbidden: insufficient permissions"}))
                 return
 
-            updates = {}
-            for field, field_type in allowed_fields.items():
-                if field in data:
-                    # Basic type validation
-                    try:
-                        if field_type == int:
-                            value = int(data[field]) if data[field] is not None else None
-                        elif field_type == str:
-                            value = str(data[field]).strip() if data[field] is not None else None
-                        elif field_type == date: # Assuming due_date is handled as string then parsed
-                            value = data[field] 
-                        else: # For ENUMs like status, priority, ensure they are valid if provided
-                            if field == 'status' and data[field] not in ['TODO', 'IN_PROGRESS', 'DONE']:
-                                raise ValueError("Invalid status value")
-                            if field == 'priority' and data[field] not in ['LOW', 'MEDIUM', 'HIGH']:
-                                raise ValueError("Invalid priority value")
-                            value = data[field]
-                        
-                        if value is not None: # Only include fields that are explicitly provided and valid
-                            updates[field] = value
-                    except (ValueError, TypeError) as ve:
-                        self._set_headers(400)
-                        self.wfile.write(json.dumps({"error": f"Invalid value for field '{field}': {ve}"}).encode("utf-8"))
-                        return
+            try:
+                updates = parse_task_updates(data, allowed_fields)
+            except ValueError as ve:
+                self._set_headers(400)
+                self.wfile.write(json_bytes({"error": str(ve)}))
+                return
             
             if not updates:
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "No valid fields provided for update"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "No valid fields provided for update"}))
                 return
             
             # Build SET clause for SQL query
@@ -522,17 +2631,24 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
             values.append(task_id)
 
             update_query = f"UPDATE tasks SET {set_clause} WHERE id=%s"
-            execute_query(update_query, tuple(values))
+            with transaction():
+                execute_query(update_query, tuple(values))
+                bump_versions("tasks")
 
-            # Fetch the updated task to return
-            updated_task = execute_query("SELECT * FROM tasks WHERE id=%s", (task_id,), fetch_one=True, dictionary=True)
+                # Fetch the updated task to return
+                updated_task = execute_query("SELECT * FROM tasks WHERE id=%s", (task_id,), fetch_one=True, dictionary=True)
+            # The previous team and assignee hear about it too, so they can drop the task
+            event_hub.publish("task.updated", updated_task, updated_task["team_id"],
+                              (updated_task["created_by"], updated_task["assigned_to"], current_task["assigned_to"]))
+            if current_task["team_id"] != updated_task["team_id"]:
+                event_hub.publish("task.updated", updated_task, current_task["team_id"])
             
             self._set_headers(200)
-            self.wfile.write(json.dumps(updated_task, default=str).encode("utf-8"))
+            self.wfile.write(json_bytes(updated_task))
         except Exception as e:
             print(f"Error in do_PUT: {e}")
             self._set_headers(500)
-            self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": str(e)}))
 
     def do_DELETE(self):
         parsed_path = urlparse(self.path)
@@ -540,7 +2656,11 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
         
         if not path.startswith("/tasks/"):
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
+            return
+
+        if path == "/tasks/bulk":
+            self.handle_bulk_delete()
             return
         
         try:
@@ -548,51 +2668,55 @@ class TaskServiceHandler(BaseHTTPRequestHandler):
             role = self.headers.get("X-User-Role", "MEMBER")
             user_id = int(self.headers.get("X-User-Id", "0"))
 
-            # Fetch current task details to check permissions
-            current_task = execute_query("SELECT created_by, team_id FROM tasks WHERE id=%s", (task_id,), fetch_one=True, dictionary=True)
+            # Fetch current task details and its team leader to check permissions
+            current_task = execute_query("SELECT t.created_by, t.assigned_to, t.team_id, te.leader_id FROM tasks t LEFT JOIN teams te ON t.team_id = te.id WHERE t.id=%s", (task_id,), fetch_one=True, dictionary=True)
             if not current_task:
                 self._set_headers(404)
-                self.wfile.write(json.dumps({"error": "Task not found"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Task not found"}))
                 return
 
-            # Fetch team leader ID
-            team_leader_info = execute_query("SELECT leader_id FROM teams WHERE id=%s", (current_task['team_id'],), fetch_one=True, dictionary=True)
-            team_leader_id = team_leader_info.get('leader_id') if team_leader_info else None
-
-            # Permissions: Admin, Team Leader, or Creator can delete
-            if not (role == 'ADMIN' or (role == 'TEAM_LEADER' and team_leader_id == user_id) or (current_task.get('created_by') == user_id)):
+            if not can_delete_task(current_task, role, user_id):
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Forbidden: insufficient permissions to delete this task"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Forbidden: insufficient permissions to delete this task"}))
                 return
 
+            removed_files = execute_query("SELECT DISTINCT url, content_hash FROM attachments WHERE task_id=%s", (task_id,), fetch_all=True, dictionary=False)
+
             # Delete task (cascade delete for comments and attachments is handled by DB foreign key constraint)
-            execute_query("DELETE FROM tasks WHERE id=%s", (task_id,))
+            with transaction():
+                execute_query("DELETE FROM tasks WHERE id=%s", (task_id,))
+                execute_query("INSERT INTO tombstones (entity, entity_id) VALUES ('tasks', %s)", (task_id,))
+                bump_versions("tasks") # comments/attachments go with it through ON DELETE CASCADE
+            event_hub.publish("task.deleted", {"id": task_id}, current_task["team_id"],
+                              (current_task["created_by"], current_task["assigned_to"]))
+
+            if removed_files:
+                try:
+                    collect_attachment_files(removed_files)
+                except Exception as e:
+                    # The task is gone either way; a leftover file is only wasted space
+                    print(f"Error collecting attachment files for task {task_id}: {e}")
             
             self._set_headers(200)
-            self.wfile.write(json.dumps({"message": "Task deleted successfully"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"message": "Task deleted successfully"}))
 
         except Exception as e:
             print(f"Error in do_DELETE: {e}")
             self._set_headers(500)
-            self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": str(e)}))
 
 
 def run(port=8082):
-    import time
     global db_pool
-    
+
     # Database connection retry loop
     for _ in range(30): # Retry for up to 30 seconds
         try:
             if db_pool is None:
                 db_pool = mysql.connector.pooling.MySQLConnectionPool(
                     pool_name="task_service_pool",
-                    pool_size=5,
-                    host=os.getenv("DB_HOST", "localhost"),
-                    user=os.getenv("DB_USER", "root"),
-                    password=os.getenv("DB_PASS", ""),
-                    database=os.getenv("DB_NAME", "pms"),
-                    autocommit=True
+                    pool_size=DB_POOL_SIZE,
+                    **DB_CONFIG
                 )
             # Test connection
             conn = get_db_conn()
@@ -600,8 +2724,9 @@ def run(port=8082):
             cur.execute("SELECT 1") 
             cur.fetchall() # Consume result
             cur.close()
+            apply_migrations(conn, "Task Service")
             conn.close() 
-            print("Task Service: Successfully connected to the database pool.")
+            print("Task Service: Successfully connected to the database pool and applied migrations.")
             break
         except Exception as e:
             print(f"Task Service: Waiting for database... ({e})")
@@ -610,8 +2735,20 @@ def run(port=8082):
         print("Task Service: Could not connect to the database after multiple attempts. Exiting.")
         return # Exit if unable to connect to DB
 
+    revocations.start("Task Service")
+    start_tombstone_purge("Task Service", "tasks")
+    event_hub.start()
+    if isinstance(storage, S3Storage):
+        try:
+            storage.ensure_bucket()
+        except Exception as e:
+            print(f"Task Service: Could not create attachment bucket '{storage.bucket}': {e}")
+
     server_address = ("", port)
-    httpd = HTTPServer(server_address, TaskServiceHandler)
+    # Each request holds one connection for its lifetime, so one worker per pool (and overflow) slot
+    max_connections = DB_POOL_SIZE + DB_POOL_OVERFLOW
+    workers = min(int(os.getenv("SERVER_WORKERS", str(max_connections))), max_connections)
+    httpd = make_server(server_address, TaskServiceHandler, workers)
     print(f"Task Service running on http://localhost:{port}")
     httpd.serve_forever()
 
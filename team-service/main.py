@@ -1,8 +1,18 @@
 import json
+import time
 import os
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import sys
 from urllib.parse import urlparse, parse_qs
 import mysql.connector.pooling
+# The Dockerfile copies pms_common.py next to this file; in a checkout it lives in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from pms_common import (
+    InstrumentedConnection, ServiceHandler, apply_migrations, bump_versions, deleted_since, json_bytes,
+    listing_etag, make_server, metrics, new_sync_token, notify_cache_invalidation, parse_since, revocations,
+    revoke_user_tokens, start_tombstone_purge, sync_since,
+)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
 
 # db_pool will be initialized in the run() function
 db_pool = None
@@ -10,29 +20,31 @@ db_pool = None
 def get_db_conn():
     if db_pool is None:
         raise Exception("Database connection pool not initialized.")
-    return db_pool.get_connection()
+    try:
+        return InstrumentedConnection(db_pool.get_connection())
+    except mysql.connector.errors.PoolError:
+        metrics.inc("db_pool_exhausted_total")
+        raise
+
 
-class TeamHandler(BaseHTTPRequestHandler):
-    def _set_headers(self, status=200, content_type="application/json"):
-        self.send_response(status)
-        self.send_header("Content-Type", content_type)
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization, X-User-Role, X-User-Id")
-        self.end_headers()
+metrics.register("gauge", "db_pool_size", "Pooled database connections.", read=lambda: {(): DB_POOL_SIZE})
 
-    def do_OPTIONS(self):
-        self._set_headers(200)
 
+class TeamHandler(ServiceHandler):
     def do_GET(self):
         parsed_path = urlparse(self.path)
         path = parsed_path.path
         
+        if path == "/metrics":
+            self._set_headers(200, "text/plain; version=0.0.4; charset=utf-8")
+            self.wfile.write(metrics.render())
+            return
+
         if path == "/teams/count":
             # Accessible to any authenticated user
             if not self.headers.get("X-User-Id"):
                 self._set_headers(401)
-                self.wfile.write(json.dumps({"error": "Unauthorized"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Unauthorized"}))
                 return
             
             conn = None
@@ -43,10 +55,10 @@ class TeamHandler(BaseHTTPRequestHandler):
                 cur.execute("SELECT COUNT(*) as count FROM teams")
                 result = cur.fetchone()
                 self._set_headers(200)
-                self.wfile.write(json.dumps(result).encode("utf-8"))
+                self.wfile.write(json_bytes(result))
             except Exception as e:
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     if 'cur' in locals() and cur:
@@ -69,23 +81,27 @@ class TeamHandler(BaseHTTPRequestHandler):
             try:
                 conn = get_db_conn()
                 cur = conn.cursor(dictionary=True)
+                # Teams embed leader details, so user changes invalidate these listings too
+                etag = listing_etag(conn, self, ("teams", "users"))
+                if self._not_modified(etag):
+                    return
 
                 if path.startswith("/teams/") and path != "/teams":
                     try:
                         team_id = int(path.split('/')[-1])
                     except ValueError:
                         self._set_headers(400)
-                        self.wfile.write(json.dumps({"error": "Invalid team id"}).encode("utf-8"))
+                        self.wfile.write(json_bytes({"error": "Invalid team id"}))
                         return
 
-                    cur.execute("SELECT id, name, description, leader_id, members, created_at FROM teams WHERE id=%s", (team_id,))
+                    cur.execute("SELECT id, name, description, leader_id, created_at FROM teams WHERE id=%s", (team_id,))
                     team = cur.fetchone()
                     if not team:
                         self._set_headers(404)
-                        self.wfile.write(json.dumps({"error": "Team not found"}).encode("utf-8"))
+                        self.wfile.write(json_bytes({"error": "Team not found"}))
                         return
 
-                    members = self._parse_members(team.get('members'))
+                    members = self._fetch_members_map(conn, [team_id]).get(team_id, [])
                     all_user_ids = set(members)
                     if team.get('leader_id'):
                         all_user_ids.add(team['leader_id'])
@@ -94,78 +110,83 @@ class TeamHandler(BaseHTTPRequestHandler):
 
                     if team.get('leader_id') and team['leader_id'] in user_map:
                         team['leader'] = user_map[team['leader_id']]
-                    team['members'] = [user_map[uid] for uid in members if uid in user_map]
-                    # Return members as comma-separated string for frontend compatibility if needed, or list
+                    # Return members as comma-separated string for frontend compatibility
                     team['members'] = ",".join(map(str, members))
 
-                    self._set_headers(200)
-                    self.wfile.write(json.dumps(team, default=str).encode('utf-8'))
+                    self._set_headers(200, etag=etag)
+                    self.wfile.write(json_bytes(team))
                     return
 
                 # list teams
                 # Check for query params (e.g. ?ids=1,2,3) though usually handled by user-service, 
                 # but if we want to filter teams by ID:
                 query_params = parse_qs(parsed_path.query)
+                since = None
+                if 'since' in query_params:
+                    try:
+                        since = parse_since(query_params['since'][0])
+                    except ValueError:
+                        self._set_headers(400)
+                        self.wfile.write(json_bytes({"error": "Invalid since, expected an ISO 8601 timestamp"}))
+                        return
+                    sync_token = new_sync_token(conn)
+                    since, reset = sync_since(since)
+                # ?since= narrows every variant below to teams changed after it; each one reads teams as t
+                since_sql, since_params = (" AND t.updated_at >= %s", (since,)) if since is not None else ("", ())
                 if 'ids' in query_params:
                     ids_str = query_params['ids'][0]
                     try:
                         team_ids = [int(x) for x in ids_str.split(',')]
                         if not team_ids:
-                             self._set_headers(200)
-                             self.wfile.write(json.dumps([]).encode('utf-8'))
+                             self._set_headers(200, etag=etag)
+                             self.wfile.write(json_bytes([]))
                              return
                         placeholders = ','.join(['%s'] * len(team_ids))
-                        cur.execute(f"SELECT id, name, description, leader_id, members, created_at FROM teams WHERE id IN ({placeholders})", tuple(team_ids))
+                        cur.execute(f"SELECT t.id, t.name, t.description, t.leader_id, t.created_at FROM teams t WHERE t.id IN ({placeholders}){since_sql}",
+                                    (*team_ids, *since_params))
                     except ValueError:
                         self._set_headers(400)
-                        self.wfile.write(json.dumps({"error": "Invalid ids parameter"}).encode("utf-8"))
+                        self.wfile.write(json_bytes({"error": "Invalid ids parameter"}))
                         return
+                elif role == 'ADMIN':
+                    cur.execute(f"SELECT t.id, t.name, t.description, t.leader_id, t.created_at FROM teams t WHERE 1=1{since_sql} ORDER BY t.id",
+                                since_params)
                 else:
-                    cur.execute("SELECT id, name, description, leader_id, members, created_at FROM teams")
+                    # Only teams the requester leads or belongs to; both halves are index lookups
+                    cur.execute(f"""
+                        SELECT t.id, t.name, t.description, t.leader_id, t.created_at FROM teams t WHERE t.leader_id=%s{since_sql}
+                        UNION
+                        SELECT t.id, t.name, t.description, t.leader_id, t.created_at
+                        FROM team_members tm JOIN teams t ON t.id = tm.team_id
+                        WHERE tm.user_id=%s{since_sql}
+                        ORDER BY id
+                    """, (requester_id, *since_params, requester_id, *since_params))
                 
-                all_teams = cur.fetchall()
+                result = cur.fetchall()
+                members_map = self._fetch_members_map(conn, [team['id'] for team in result])
                 
                 all_user_ids = set()
-                for team in all_teams:
-                    members = self._parse_members(team.get('members'))
+                for team in result:
                     if team.get('leader_id'):
                         all_user_ids.add(team['leader_id'])
-                    all_user_ids.update(members)
                 
                 user_map = self._fetch_user_details_map(conn, list(all_user_ids))
 
-                result = []
-                for team in all_teams:
-                    members = self._parse_members(team.get('members'))
-                    
-                    visible = False
-                    if role == 'ADMIN':
-                        visible = True
-                    if team.get('leader_id') == requester_id:
-                        visible = True
-                    if requester_id in members:
-                        visible = True
-                    
-                    # For simplicity, let's allow viewing all teams in the list, 
-                    # or restrict if needed. The prompt implies "view to see all members", 
-                    # suggesting listing might be open or role-based.
-                    # Current logic restricts visibility.
-                    # If ids are requested specifically, maybe allow?
-                    if 'ids' in query_params:
-                        visible = True 
-
-                    if visible:
-                        if team.get('leader_id') and team['leader_id'] in user_map:
-                            team['leader'] = user_map[team['leader_id']]
-                        team['members'] = ",".join(map(str, members))
-                        result.append(team)
+                for team in result:
+                    if team.get('leader_id') and team['leader_id'] in user_map:
+                        team['leader'] = user_map[team['leader_id']]
+                    team['members'] = ",".join(map(str, members_map.get(team['id'], [])))
 
-                self._set_headers(200)
-                self.wfile.write(json.dumps(result, default=str).encode('utf-8'))
+                self._set_headers(200, etag=etag)
+                if since is not None:
+                    self.wfile.write(json_bytes({"teams": result, "deleted": [] if reset else deleted_since(conn, "teams", since),
+                                                 "reset": reset, "sync_token": sync_token}))
+                else:
+                    self.wfile.write(json_bytes(result))
             except Exception as e:
                 print(f"Error in do_GET: {e}") # Debug log
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     if 'cur' in locals() and cur:
@@ -176,29 +197,43 @@ class TeamHandler(BaseHTTPRequestHandler):
                     pass
         else:
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
 
-    def _parse_members(self, members_raw):
-        if not members_raw:
-            return []
-        try:
-            parsed = json.loads(members_raw)
-            if isinstance(parsed, list):
-                return [int(x) for x in parsed]
-            if isinstance(parsed, int):
-                return [parsed]
-            if isinstance(parsed, str):
-                if ',' in parsed:
-                    return [int(x.strip()) for x in parsed.split(',') if x.strip()]
-                if parsed.isdigit():
-                    return [int(parsed)]
-                return []
-        except json.JSONDecodeError:
-            if isinstance(members_raw, str):
-                 return [int(x.strip()) for x in members_raw.split(',') if x.strip().isdigit()]
-            return []
-        except Exception:
-            return []
+    def _fetch_members_map(self, conn, team_ids):
+        """Return {team_id: [user_id, ...]} for the given teams from team_members."""
+        if not team_ids:
+            return {}
+        cur = conn.cursor()
+        placeholders = ','.join(['%s'] * len(team_ids))
+        cur.execute(f"SELECT team_id, user_id FROM team_members WHERE team_id IN ({placeholders}) ORDER BY team_id, user_id", tuple(team_ids))
+        members_map = {}
+        for team_id, user_id in cur.fetchall():
+            members_map.setdefault(team_id, []).append(user_id)
+        cur.close()
+        return members_map
+
+    def _members_from_payload(self, raw_members):
+        # Accept a list, a comma-separated string or a single id, as the frontend sends all three
+        if isinstance(raw_members, list):
+            members = [int(x) for x in raw_members]
+        elif isinstance(raw_members, str):
+            members = [int(x.strip()) for x in raw_members.split(',') if x.strip().isdigit()]
+        elif isinstance(raw_members, int):
+            members = [raw_members]
+        else:
+            members = []
+        return list(dict.fromkeys(members))
+
+    def _replace_members(self, conn, team_id, members):
+        cur = conn.cursor()
+        cur.execute("DELETE FROM team_members WHERE team_id=%s", (team_id,))
+        if members:
+            # Unknown user ids are skipped rather than failing the whole request
+            placeholders = ','.join(['%s'] * len(members))
+            cur.execute(f"INSERT INTO team_members (team_id, user_id) SELECT %s, id FROM users WHERE id IN ({placeholders})", (team_id, *members))
+        # Members are part of the team as clients see it, so this changes the team for ?since= sync
+        cur.execute("UPDATE teams SET updated_at = CURRENT_TIMESTAMP(6) WHERE id=%s", (team_id,))
+        cur.close()
 
     def _fetch_user_details_map(self, conn, ids):
         if not ids:
@@ -224,47 +259,39 @@ class TeamHandler(BaseHTTPRequestHandler):
                 data = json.loads(body.decode("utf-8"))
             except json.JSONDecodeError:
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid JSON"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid JSON"}))
                 return
             
             role = self.headers.get("X-User-Role", "MEMBER")
             if role != "ADMIN":
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Forbidden: only ADMIN can create teams"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Forbidden: only ADMIN can create teams"}))
                 return
 
             required = ["name", "description"]
             if not all(field in data for field in required):
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Missing name or description"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Missing name or description"}))
                 return
 
             try:
-                members_list = []
-                if "members" in data:
-                    raw_members = data["members"]
-                    if isinstance(raw_members, list):
-                        members_list = raw_members
-                    elif isinstance(raw_members, str):
-                         members_list = [int(x.strip()) for x in raw_members.split(',') if x.strip().isdigit()]
-                    elif isinstance(raw_members, int):
-                        members_list = [raw_members]
-                
-                members_json = json.dumps(members_list)
+                members = self._members_from_payload(data.get("members"))
 
                 conn = get_db_conn()
+                conn.start_transaction()
                 cur = conn.cursor()
-                cur.execute("INSERT INTO teams (name, description, leader_id, members) VALUES (%s,%s,%s,%s)",
-                            (data["name"], data["description"], data.get("leader_id", None), members_json))
+                cur.execute("INSERT INTO teams (name, description, leader_id) VALUES (%s,%s,%s)",
+                            (data["name"], data["description"], data.get("leader_id", None)))
                 team_id = cur.lastrowid
+                self._replace_members(conn, team_id, members)
+                bump_versions(conn, "teams")
                 conn.commit()
                 cur.close()
                 
                 cur = conn.cursor(dictionary=True)
-                cur.execute("SELECT id, name, description, leader_id, members, created_at FROM teams WHERE id=%s", (team_id,))
+                cur.execute("SELECT id, name, description, leader_id, created_at FROM teams WHERE id=%s", (team_id,))
                 team = cur.fetchone()
 
-                members = self._parse_members(team.get('members'))
                 all_user_ids = set(members)
                 if team.get('leader_id'):
                     all_user_ids.add(team['leader_id'])
@@ -277,10 +304,10 @@ class TeamHandler(BaseHTTPRequestHandler):
                 team['members'] = ",".join(map(str, members))
 
                 self._set_headers(201)
-                self.wfile.write(json.dumps(team, default=str).encode("utf-8"))
+                self.wfile.write(json_bytes(team))
             except Exception as e:
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     if 'cur' in locals() and cur:
@@ -291,7 +318,7 @@ class TeamHandler(BaseHTTPRequestHandler):
                     pass
         else:
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
 
     def do_PUT(self):
         parsed_path = urlparse(self.path)
@@ -302,7 +329,7 @@ class TeamHandler(BaseHTTPRequestHandler):
                 team_id = int(path.split('/')[-1])
             except (IndexError, ValueError):
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid team id"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid team id"}))
                 return
 
             role = self.headers.get("X-User-Role", "MEMBER")
@@ -320,12 +347,12 @@ class TeamHandler(BaseHTTPRequestHandler):
                 team = cur.fetchone()
                 if not team:
                     self._set_headers(404)
-                    self.wfile.write(json.dumps({"error": "Team not found"}).encode("utf-8"))
+                    self.wfile.write(json_bytes({"error": "Team not found"}))
                     return
 
                 if role != "ADMIN" and not (role == "TEAM_LEADER" and team.get("leader_id") == user_id):
                     self._set_headers(403)
-                    self.wfile.write(json.dumps({"error": "Forbidden: insufficient role or not team leader"}).encode("utf-8"))
+                    self.wfile.write(json_bytes({"error": "Forbidden: insufficient role or not team leader"}))
                     return
 
                 length = int(self.headers.get("Content-Length", 0))
@@ -333,12 +360,12 @@ class TeamHandler(BaseHTTPRequestHandler):
 
                 if "leader_id" in data and role != "ADMIN":
                     self._set_headers(403)
-                    self.wfile.write(json.dumps({"error": "Only ADMIN can change team leader"}).encode("utf-8"))
+                    self.wfile.write(json_bytes({"error": "Only ADMIN can change team leader"}))
                     return
 
                 if "members" in data and not (role == "TEAM_LEADER" and team.get("leader_id") == user_id):
                     self._set_headers(403)
-                    self.wfile.write(json.dumps({"error": "Only the team leader can modify members"}).encode("utf-8"))
+                    self.wfile.write(json_bytes({"error": "Only the team leader can modify members"}))
                     return
 
                 fields = []
@@ -352,25 +379,19 @@ class TeamHandler(BaseHTTPRequestHandler):
                 if "leader_id" in data:
                     fields.append("leader_id=%s")
                     values.append(data["leader_id"])
-                if "members" in data:
-                    fields.append("members=%s")
-                    raw_members = data["members"]
-                    members_list = []
-                    if isinstance(raw_members, list):
-                        members_list = raw_members
-                    elif isinstance(raw_members, str):
-                         members_list = [int(x.strip()) for x in raw_members.split(',') if x.strip().isdigit()]
-                    elif isinstance(raw_members, int):
-                        members_list = [raw_members]
-                    values.append(json.dumps(members_list))
-
-                if not fields:
+
+                if not fields and "members" not in data:
                     self._set_headers(400)
-                    self.wfile.write(json.dumps({"error": "No fields to update"}).encode("utf-8"))
+                    self.wfile.write(json_bytes({"error": "No fields to update"}))
                     return
 
-                values.append(team_id)
-                cur.execute(f"UPDATE teams SET {', '.join(fields)} WHERE id=%s", tuple(values))
+                conn.start_transaction()
+                if fields:
+                    values.append(team_id)
+                    cur.execute(f"UPDATE teams SET {', '.join(fields)} WHERE id=%s", tuple(values))
+                if "members" in data:
+                    self._replace_members(conn, team_id, self._members_from_payload(data["members"]))
+                bump_versions(conn, "teams")
                 conn.commit()
 
                 if "leader_id" in data and data["leader_id"] is not None:
@@ -382,14 +403,19 @@ class TeamHandler(BaseHTTPRequestHandler):
                     if user_to_promote and user_to_promote['role'] == 'MEMBER':
                         update_cur = conn.cursor()
                         update_cur.execute("UPDATE users SET role='TEAM_LEADER' WHERE id=%s", (new_leader_id,))
+                        bump_versions(conn, "users")
                         conn.commit()
                         update_cur.close()
+                        # Their tokens still carry role MEMBER: revoke them, as user-service does on role changes
+                        revoke_user_tokens(conn, new_leader_id)
+                        notify_cache_invalidation("users", [new_leader_id])
 
+                notify_cache_invalidation("teams", [team_id])
                 self._set_headers(200)
-                self.wfile.write(json.dumps({"status": "ok"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"status": "ok"}))
             except Exception as e:
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     if 'cur' in locals() and cur:
@@ -400,7 +426,7 @@ class TeamHandler(BaseHTTPRequestHandler):
                     pass
         else:
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
 
     def do_DELETE(self):
         parsed_path = urlparse(self.path)
@@ -410,31 +436,36 @@ class TeamHandler(BaseHTTPRequestHandler):
             role = self.headers.get("X-User-Role", "MEMBER")
             if role != "ADMIN":
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Forbidden: only ADMIN can delete teams"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Forbidden: only ADMIN can delete teams"}))
                 return
 
             try:
                 team_id = int(path.split('/')[-1])
             except (IndexError, ValueError):
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid team id"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid team id"}))
                 return
 
             conn = None
             cur = None
             try:
                 conn = get_db_conn()
+                conn.start_transaction()
                 cur = conn.cursor()
                 cur.execute("DELETE FROM teams WHERE id=%s", (team_id,))
-                conn.commit()
                 if cur.rowcount == 0:
+                    conn.rollback()
                     self._set_headers(404)
-                    self.wfile.write(json.dumps({"error": "Team not found"}).encode("utf-8"))
+                    self.wfile.write(json_bytes({"error": "Team not found"}))
                     return
+                cur.execute("INSERT INTO tombstones (entity, entity_id) VALUES ('teams', %s)", (team_id,))
+                bump_versions(conn, "teams")
+                conn.commit()
+                notify_cache_invalidation("teams", [team_id])
                 self._set_headers(204)
             except Exception as e:
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     if 'cur' in locals() and cur:
@@ -445,19 +476,18 @@ class TeamHandler(BaseHTTPRequestHandler):
                     pass
         else:
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
 
 
 def run(port=8081):
-    import time
     global db_pool # Declare db_pool as global
     conn = None
-    cur = None
+    pool_size = DB_POOL_SIZE
     for _ in range(30): # Retry database connection for up to 30 seconds
         try:
             db_pool = mysql.connector.pooling.MySQLConnectionPool(
                 pool_name="team_service_pool",
-                pool_size=5, # You can adjust this based on your expected load
+                pool_size=pool_size,
                 host=os.getenv("DB_HOST", "localhost"),
                 user=os.getenv("DB_USER", "root"),
                 password=os.getenv("DB_PASS", ""),
@@ -465,19 +495,9 @@ def run(port=8081):
                 autocommit=True
             )
             conn = get_db_conn() # Get a connection from the newly initialized pool
-            cur = conn.cursor()
-            db_name = os.getenv("DB_NAME", "pms")
-            
-            cur.execute("SHOW COLUMNS FROM teams LIKE 'created_at'")
-            column_exists = cur.fetchone() # Consume the result
-            if not column_exists:
-                cur.execute("ALTER TABLE teams ADD COLUMN created_at DATETIME DEFAULT CURRENT_TIMESTAMP")
-                conn.commit()
-                print("team-service: added created_at column to teams")
-            
-            cur.close()
+            apply_migrations(conn, "Team Service")
             conn.close()
-            print("Team Service: Successfully connected to the database pool and checked schema.")
+            print("Team Service: Successfully connected to the database pool and applied migrations.")
             break
         except Exception as e:
             print(f"Team Service: Waiting for database or checking schema... ({e})")
@@ -487,8 +507,13 @@ def run(port=8081):
         print("Team Service: Could not connect to the database or check schema after multiple attempts. Exiting.")
         return # Exit if unable to connect to DB
 
+    revocations.start("Team Service")
+    start_tombstone_purge("Team Service", "teams")
+
     server_address = ("", port)
-    httpd = HTTPServer(server_address, TeamHandler)
+    # Each request holds at most one pooled connection, so never run more workers than the pool can serve
+    workers = min(int(os.getenv("SERVER_WORKERS", str(pool_size))), pool_size)
+    httpd = make_server(server_address, TeamHandler, workers)
     print(f"Team Service running on http://localhost:{port}")
     httpd.serve_forever()
 
@@ -1,12 +1,34 @@
 import json
 import os
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import sys
+import threading
+import time
 from urllib.parse import parse_qs
 import mysql.connector
-
-
-def get_db_conn():
-    return mysql.connector.connect(
+import mysql.connector.pooling
+# The Dockerfile copies pms_common.py next to this file; in a checkout it lives in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from pms_common import (
+    InstrumentedConnection, ServiceHandler, apply_migrations, bump_versions, deleted_since, issue_token,
+    json_bytes, listing_etag, make_server, metrics, new_sync_token, notify_cache_invalidation, parse_since,
+    revocations, revoke_token, revoke_user_tokens, start_tombstone_purge, sync_since, verify_token,
+)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+# How long a request waits for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+
+# db_pool will be initialized in the run() function
+db_pool = None
+# Checkout counters, exposed on GET /health
+pool_stats = {"checkouts": 0, "waits": 0, "exhausted": 0, "wait_seconds": 0.0}
+_pool_stats_lock = threading.Lock()
+
+def init_db_pool():
+    global db_pool
+    db_pool = mysql.connector.pooling.MySQLConnectionPool(
+        pool_name="user_service_pool",
+        pool_size=DB_POOL_SIZE,
         host=os.getenv("DB_HOST", "localhost"),
         user=os.getenv("DB_USER", "root"),
         password=os.getenv("DB_PASS", ""),
@@ -14,29 +36,68 @@ def get_db_conn():
         autocommit=True,
     )
 
-
-class UserHandler(BaseHTTPRequestHandler):
-    def _set_headers(self, status=200, content_type="application/json"):
-        self.send_response(status)
-        self.send_header("Content-Type", content_type)
-        self.send_header("Access-Control-Allow-Origin", "*")
-        # include DELETE so browsers can preflight and allow DELETE requests from the frontend
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization, X-User-Role, X-User-Id")
-        self.end_headers()
-
-    def do_OPTIONS(self):
-        # CORS preflight
-        self._set_headers(200)
+def get_db_conn():
+    """Check a connection out of the shared pool.
+
+    MySQLConnectionPool.get_connection pings the connection and reconnects it
+    if MySQL dropped it, but fails immediately when the pool is empty; here we
+    retry until DB_POOL_TIMEOUT and count how often that happens.
+    """
+    if db_pool is None:
+        raise Exception("Database connection pool not initialized.")
+    started = time.monotonic()
+    waited = False
+    while True:
+        try:
+            conn = db_pool.get_connection()
+            break
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() - started >= DB_POOL_TIMEOUT:
+                with _pool_stats_lock:
+                    pool_stats["exhausted"] += 1
+                metrics.inc("db_pool_exhausted_total")
+                raise
+            waited = True
+            time.sleep(0.005)
+    with _pool_stats_lock:
+        pool_stats["checkouts"] += 1
+        if waited:
+            pool_stats["waits"] += 1
+            pool_stats["wait_seconds"] += time.monotonic() - started
+    return InstrumentedConnection(conn)
+
+
+metrics.register("gauge", "db_pool_size", "Pooled database connections.", read=lambda: {(): DB_POOL_SIZE})
+# The checkout counters that GET /health also reports
+metrics.register("counter", "db_pool_checkouts_total", "Connections checked out of the pool.", read=lambda: {(): pool_stats["checkouts"]})
+metrics.register("counter", "db_pool_waits_total", "Checkouts that had to wait for a free connection.", read=lambda: {(): pool_stats["waits"]})
+metrics.register("counter", "db_pool_wait_seconds_total", "Time spent waiting for a free connection.", read=lambda: {(): pool_stats["wait_seconds"]})
+
+
+class UserHandler(ServiceHandler):
+    token_exempt_paths = ServiceHandler.token_exempt_paths + ("/login", "/signup")
+
+    def _get_requester(self, auth):
+        # Resolve "Bearer <token>" to {id, role} from the signed claims; None if missing or invalid
+        if not auth.startswith("Bearer "):
+            return None
+        claims = verify_token(auth[len("Bearer "):])
+        if not claims:
+            return None
+        return {"id": claims["sub"], "role": claims["role"]}
 
     def do_POST(self):
+        if self.path == "/logout":
+            self.handle_logout()
+            return
+
         length = int(self.headers.get("Content-Length", 0))
         body = self.rfile.read(length)
         try:
             data = json.loads(body.decode("utf-8"))
         except json.JSONDecodeError:
             self._set_headers(400)
-            self.wfile.write(json.dumps({"error": "Invalid JSON"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Invalid JSON"}))
             return
 
         if self.path == "/signup":
@@ -45,45 +106,62 @@ class UserHandler(BaseHTTPRequestHandler):
             self.handle_login(data)
         else:
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
 
     def do_GET(self):
-        # GET /users -> list all users (ADMIN only)
-        if self.path == "/users":
+        path, _, query = self.path.partition("?")
+        query_params = parse_qs(query)
+        # GET /health -> liveness plus DB pool counters
+        if self.path == "/health":
+            with _pool_stats_lock:
+                stats = dict(pool_stats)
+            stats["size"] = DB_POOL_SIZE
+            stats["timeout"] = DB_POOL_TIMEOUT
+            self._set_headers(200)
+            self.wfile.write(json_bytes({"status": "ok", "db_pool": stats}))
+
+        # GET /metrics -> Prometheus metrics
+        elif path == "/metrics":
+            self._set_headers(200, "text/plain; version=0.0.4; charset=utf-8")
+            self.wfile.write(metrics.render())
+
+        # GET /users -> list all users (ADMIN only); ?since= returns only changes
+        elif path == "/users" and "ids" not in query_params:
             # check requester is ADMIN
             auth = self.headers.get("Authorization", "")
-            requester = None
-            if auth.startswith("Bearer token-"):
-                try:
-                    rid = int(auth.split("-")[-1])
-                    conn = get_db_conn()
-                    cur = conn.cursor(dictionary=True)
-                    cur.execute("SELECT id, role FROM users WHERE id=%s", (rid,))
-                    requester = cur.fetchone()
-                except Exception:
-                    requester = None
-                finally:
-                    try:
-                        cur.close()
-                        conn.close()
-                    except Exception:
-                        pass
+            requester = self._get_requester(auth)
 
             if not requester or requester.get("role") != "ADMIN":
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Forbidden: admin only"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Forbidden: admin only"}))
+                return
+
+            try:
+                since = parse_since(query_params["since"][0]) if "since" in query_params else None
+            except ValueError:
+                self._set_headers(400)
+                self.wfile.write(json_bytes({"error": "Invalid since, expected an ISO 8601 timestamp"}))
                 return
 
             try:
                 conn = get_db_conn()
                 cur = conn.cursor(dictionary=True)
+                if since is not None:
+                    sync_token = new_sync_token(conn)
+                    since, reset = sync_since(since)
+                    cur.execute("SELECT id, username, email, first_name, last_name, role, active FROM users WHERE updated_at >= %s", (since,))
+                    rows = cur.fetchall()
+                    self._set_headers(200)
+                    self.wfile.write(json_bytes({"users": rows, "deleted": [] if reset else deleted_since(conn, "users", since),
+                                                 "reset": reset, "sync_token": sync_token}))
+                    return
                 cur.execute("SELECT id, username, email, first_name, last_name, role, active FROM users")
                 rows = cur.fetchall()
                 self._set_headers(200)
-                self.wfile.write(json.dumps(rows, default=str).encode("utf-8"))
+                self.wfile.write(json_bytes(rows))
             except Exception as e:
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     cur.close()
@@ -92,24 +170,42 @@ class UserHandler(BaseHTTPRequestHandler):
                     pass
 
         # GET /users/public -> list minimal user info for selection (available to authenticated users)
-        elif self.path == "/users/public":
+        elif path == "/users/public":
             # require a user id header (set by frontend via X-User-Id) or Authorization
             header_uid = self.headers.get('X-User-Id') or self.headers.get('Authorization')
             if not header_uid:
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Forbidden"}).encode('utf-8'))
+                self.wfile.write(json_bytes({"error": "Forbidden"}))
+                return
+            try:
+                since = parse_since(query_params["since"][0]) if "since" in query_params else None
+            except ValueError:
+                self._set_headers(400)
+                self.wfile.write(json_bytes({"error": "Invalid since, expected an ISO 8601 timestamp"}))
                 return
             try:
                 conn = get_db_conn()
                 cur = conn.cursor(dictionary=True)
+                etag = listing_etag(conn, self, ("users",))
+                if self._not_modified(etag):
+                    return
+                if since is not None:
+                    sync_token = new_sync_token(conn)
+                    since, reset = sync_since(since)
+                    cur.execute("SELECT id, username, first_name, last_name, active FROM users WHERE updated_at >= %s ORDER BY username ASC", (since,))
+                    rows = cur.fetchall()
+                    self._set_headers(200, etag=etag)
+                    self.wfile.write(json_bytes({"users": rows, "deleted": [] if reset else deleted_since(conn, "users", since),
+                                                 "reset": reset, "sync_token": sync_token}))
+                    return
                 # return only minimal fields for dropdowns
                 cur.execute("SELECT id, username, first_name, last_name, active FROM users ORDER BY username ASC")
                 rows = cur.fetchall()
-                self._set_headers(200)
-                self.wfile.write(json.dumps(rows, default=str).encode('utf-8'))
+                self._set_headers(200, etag=etag)
+                self.wfile.write(json_bytes(rows))
             except Exception as e:
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode('utf-8'))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     cur.close()
@@ -125,7 +221,7 @@ class UserHandler(BaseHTTPRequestHandler):
             ids_str = query_params.get("ids")
             if not ids_str:
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Missing 'ids' query parameter"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Missing 'ids' query parameter"}))
                 return
 
             try:
@@ -133,14 +229,14 @@ class UserHandler(BaseHTTPRequestHandler):
                 print(f"DEBUG: user-service - Received user_ids for GET /users?ids=: {user_ids}")
             except ValueError:
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid 'ids' format"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid 'ids' format"}))
                 return
 
             # require a user id header (set by frontend via X-User-Id) or Authorization
             header_uid = self.headers.get('X-User-Id') or self.headers.get('Authorization')
             if not header_uid:
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Forbidden"}).encode('utf-8'))
+                self.wfile.write(json_bytes({"error": "Forbidden"}))
                 return
 
             conn = None
@@ -153,11 +249,11 @@ class UserHandler(BaseHTTPRequestHandler):
                 rows = cur.fetchall()
                 print(f"DEBUG: user-service - Fetched rows for user_ids {user_ids}: {rows}")
                 self._set_headers(200)
-                self.wfile.write(json.dumps(rows, default=str).encode('utf-8'))
+                self.wfile.write(json_bytes(rows))
             except Exception as e:
                 print(f"ERROR: user-service - Exception in GET /users?ids=: {e}")
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     if cur:
@@ -174,26 +270,11 @@ class UserHandler(BaseHTTPRequestHandler):
                 user_id = int(parts[2])
             except Exception:
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid user id"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid user id"}))
                 return
 
             auth = self.headers.get("Authorization", "")
-            requester = None
-            if auth.startswith("Bearer token-"):
-                try:
-                    rid = int(auth.split("-")[-1])
-                    conn = get_db_conn()
-                    cur = conn.cursor(dictionary=True)
-                    cur.execute("SELECT id, role FROM users WHERE id=%s", (rid,))
-                    requester = cur.fetchone()
-                except Exception:
-                    requester = None
-                finally:
-                    try:
-                        cur.close()
-                        conn.close()
-                    except Exception:
-                        pass
+            requester = self._get_requester(auth)
 
             allowed = False
             if requester and requester.get("role") == "ADMIN":
@@ -203,7 +284,7 @@ class UserHandler(BaseHTTPRequestHandler):
 
             if not allowed:
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Forbidden"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Forbidden"}))
                 return
 
             try:
@@ -213,13 +294,13 @@ class UserHandler(BaseHTTPRequestHandler):
                 user = cur.fetchone()
                 if not user:
                     self._set_headers(404)
-                    self.wfile.write(json.dumps({"error": "User not found"}).encode("utf-8"))
+                    self.wfile.write(json_bytes({"error": "User not found"}))
                     return
                 self._set_headers(200)
-                self.wfile.write(json.dumps(user, default=str).encode("utf-8"))
+                self.wfile.write(json_bytes(user))
             except Exception as e:
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     cur.close()
@@ -228,7 +309,7 @@ class UserHandler(BaseHTTPRequestHandler):
                     pass
         else:
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
 
     def do_PUT(self):
         # Support updating a user's role: PUT /users/<id>/role  with body {"role": "ADMIN"}
@@ -238,7 +319,7 @@ class UserHandler(BaseHTTPRequestHandler):
                 user_id = int(parts[2])
             except Exception:
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid user id"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid user id"}))
                 return
 
             length = int(self.headers.get("Content-Length", 0))
@@ -247,37 +328,22 @@ class UserHandler(BaseHTTPRequestHandler):
                 data = json.loads(body.decode("utf-8"))
             except json.JSONDecodeError:
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid JSON"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid JSON"}))
                 return
 
             new_role = data.get("role")
             if new_role not in ("ADMIN", "TEAM_LEADER", "MEMBER"):
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid role"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid role"}))
                 return
 
             # Simple auth: only an ADMIN user (based on Authorization token) can change roles
             auth = self.headers.get("Authorization", "")
-            requester = None
-            if auth.startswith("Bearer token-"):
-                try:
-                    rid = int(auth.split("-")[-1])
-                    conn = get_db_conn()
-                    cur = conn.cursor(dictionary=True)
-                    cur.execute("SELECT id, role FROM users WHERE id=%s", (rid,))
-                    requester = cur.fetchone()
-                except Exception:
-                    requester = None
-                finally:
-                    try:
-                        cur.close()
-                        conn.close()
-                    except Exception:
-                        pass
+            requester = self._get_requester(auth)
 
             if not requester or requester.get("role") != "ADMIN":
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Only ADMIN can change roles"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Only ADMIN can change roles"}))
                 return
 
             try:
@@ -285,15 +351,18 @@ class UserHandler(BaseHTTPRequestHandler):
                 cur = conn.cursor()
                 cur.execute("UPDATE users SET role=%s WHERE id=%s", (new_role, user_id))
                 conn.commit()
+                bump_versions(conn, "users")
+                revoke_user_tokens(conn, user_id)
+                notify_cache_invalidation("users", [user_id])
                 cur.close()
                 cur = conn.cursor(dictionary=True)
                 cur.execute("SELECT id, username, email, first_name, last_name, role, active FROM users WHERE id=%s", (user_id,))
                 user = cur.fetchone()
                 self._set_headers(200)
-                self.wfile.write(json.dumps(user, default=str).encode("utf-8"))
+                self.wfile.write(json_bytes(user))
             except Exception as e:
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     cur.close()
@@ -307,7 +376,7 @@ class UserHandler(BaseHTTPRequestHandler):
                 user_id = int(parts[2])
             except Exception:
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid user id"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid user id"}))
                 return
 
             length = int(self.headers.get("Content-Length", 0))
@@ -316,37 +385,22 @@ class UserHandler(BaseHTTPRequestHandler):
                 data = json.loads(body.decode("utf-8"))
             except json.JSONDecodeError:
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid JSON"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid JSON"}))
                 return
 
             new_active = data.get("active")
             if not isinstance(new_active, bool):
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid active value"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid active value"}))
                 return
 
             # Only ADMIN can change active status
             auth = self.headers.get("Authorization", "")
-            requester = None
-            if auth.startswith("Bearer token-"):
-                try:
-                    rid = int(auth.split("-")[-1])
-                    conn = get_db_conn()
-                    cur = conn.cursor(dictionary=True)
-                    cur.execute("SELECT id, role FROM users WHERE id=%s", (rid,))
-                    requester = cur.fetchone()
-                except Exception:
-                    requester = None
-                finally:
-                    try:
-                        cur.close()
-                        conn.close()
-                    except Exception:
-                        pass
+            requester = self._get_requester(auth)
 
             if not requester or requester.get("role") != "ADMIN":
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Only ADMIN can change active status"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Only ADMIN can change active status"}))
                 return
 
             try:
@@ -354,15 +408,18 @@ class UserHandler(BaseHTTPRequestHandler):
                 cur = conn.cursor()
                 cur.execute("UPDATE users SET active=%s WHERE id=%s", (new_active, user_id))
                 conn.commit()
+                bump_versions(conn, "users")
+                revoke_user_tokens(conn, user_id)
+                notify_cache_invalidation("users", [user_id])
                 cur.close()
                 cur = conn.cursor(dictionary=True)
                 cur.execute("SELECT id, username, email, first_name, last_name, role, active FROM users WHERE id=%s", (user_id,))
                 user = cur.fetchone()
                 self._set_headers(200)
-                self.wfile.write(json.dumps(user, default=str).encode("utf-8"))
+                self.wfile.write(json_bytes(user))
             except Exception as e:
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     cur.close()
@@ -371,7 +428,7 @@ class UserHandler(BaseHTTPRequestHandler):
                     pass
         else:
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
 
     def do_DELETE(self):
         # DELETE /users/<id> -> delete user (ADMIN only)
@@ -381,46 +438,52 @@ class UserHandler(BaseHTTPRequestHandler):
                 user_id = int(parts[2])
             except Exception:
                 self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "Invalid user id"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid user id"}))
                 return
 
             # check admin
             auth = self.headers.get("Authorization", "")
-            requester = None
-            if auth.startswith("Bearer token-"):
-                try:
-                    rid = int(auth.split("-")[-1])
-                    conn = get_db_conn()
-                    cur = conn.cursor(dictionary=True)
-                    cur.execute("SELECT id, role FROM users WHERE id=%s", (rid,))
-                    requester = cur.fetchone()
-                except Exception:
-                    requester = None
-                finally:
-                    try:
-                        cur.close()
-                        conn.close()
-                    except Exception:
-                        pass
+            requester = self._get_requester(auth)
 
             if not requester or requester.get("role") != "ADMIN":
                 self._set_headers(403)
-                self.wfile.write(json.dumps({"error": "Forbidden: admin only"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Forbidden: admin only"}))
                 return
 
             try:
                 conn = get_db_conn()
+                conn.start_transaction()
                 cur = conn.cursor()
+                # Teams the user is in or leads change too (the membership rows go with the
+                # user via ON DELETE CASCADE): find them before they do
+                cur.execute("""
+                    SELECT team_id FROM team_members WHERE user_id=%s
+                    UNION SELECT id FROM teams WHERE leader_id=%s
+                """, (user_id, user_id))
+                team_ids = [row[0] for row in cur.fetchall()]
                 cur.execute("DELETE FROM users WHERE id=%s", (user_id,))
-                conn.commit()
                 if cur.rowcount == 0:
+                    conn.rollback()
                     self._set_headers(404)
-                    self.wfile.write(json.dumps({"error": "User not found"}).encode("utf-8"))
+                    self.wfile.write(json_bytes({"error": "User not found"}))
                     return
+                cur.execute("INSERT INTO tombstones (entity, entity_id) VALUES ('users', %s)", (user_id,))
+                if team_ids:
+                    # So ?since= syncs and the /teams ETags pick up the changed member lists
+                    placeholders = ','.join(['%s'] * len(team_ids))
+                    cur.execute(f"UPDATE teams SET updated_at=CURRENT_TIMESTAMP(6) WHERE id IN ({placeholders})", tuple(team_ids))
+                    bump_versions(conn, "users", "teams")
+                else:
+                    bump_versions(conn, "users")
+                conn.commit()
+                revoke_user_tokens(conn, user_id)
+                notify_cache_invalidation("users", [user_id])
+                if team_ids:
+                    notify_cache_invalidation("teams", team_ids)
                 self._set_headers(204)
             except Exception as e:
                 self._set_headers(500)
-                self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": str(e)}))
             finally:
                 try:
                     cur.close()
@@ -429,13 +492,13 @@ class UserHandler(BaseHTTPRequestHandler):
                     pass
         else:
             self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "Not found"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Not found"}))
 
     def handle_signup(self, data):
         required = ["username", "email", "first_name", "last_name", "password"]
         if not all(field in data and data[field] for field in required):
             self._set_headers(400)
-            self.wfile.write(json.dumps({"error": "Missing fields"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Missing fields"}))
             return
 
         try:
@@ -446,18 +509,19 @@ class UserHandler(BaseHTTPRequestHandler):
                         (data["username"], data["email"], data["first_name"], data["last_name"], data["password"], "MEMBER", False))
             user_id = cur.lastrowid
             conn.commit()
+            bump_versions(conn, "users")
             cur.close()
             cur = conn.cursor(dictionary=True)
             cur.execute("SELECT id, username, email, first_name, last_name, role, active FROM users WHERE id=%s", (user_id,))
             user = cur.fetchone()
             self._set_headers(201)
-            self.wfile.write(json.dumps(user, default=str).encode("utf-8"))
+            self.wfile.write(json_bytes(user))
         except mysql.connector.IntegrityError:
             self._set_headers(409)
-            self.wfile.write(json.dumps({"error": "Username already exists"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Username already exists"}))
         except Exception as e:
             self._set_headers(500)
-            self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": str(e)}))
         finally:
             try:
                 cur.close()
@@ -470,7 +534,7 @@ class UserHandler(BaseHTTPRequestHandler):
         password = data.get("password")
         if not username or not password:
             self._set_headers(400)
-            self.wfile.write(json.dumps({"error": "Missing username or password"}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": "Missing username or password"}))
             return
 
         try:
@@ -480,15 +544,15 @@ class UserHandler(BaseHTTPRequestHandler):
             found = cur.fetchone()
             if not found:
                 self._set_headers(401)
-                self.wfile.write(json.dumps({"error": "Invalid credentials or inactive user"}).encode("utf-8"))
+                self.wfile.write(json_bytes({"error": "Invalid credentials or inactive user"}))
                 return
 
-            token = f"token-{found['id']}"
+            token = issue_token(found)
             self._set_headers(200)
-            self.wfile.write(json.dumps({"token": token, "user": found}, default=str).encode("utf-8"))
+            self.wfile.write(json_bytes({"token": token, "user": found}))
         except Exception as e:
             self._set_headers(500)
-            self.wfile.write(json.dumps({"error": str(e)}).encode("utf-8"))
+            self.wfile.write(json_bytes({"error": str(e)}))
         finally:
             try:
                 cur.close()
@@ -496,19 +560,46 @@ class UserHandler(BaseHTTPRequestHandler):
             except Exception:
                 pass
 
+    def handle_logout(self):
+        # Revoke the presented token; other services pick it up on their next revocation reload
+        auth = self.headers.get("Authorization", "")
+        claims = verify_token(auth[len("Bearer "):]) if auth.startswith("Bearer ") else None
+        if not claims:
+            self._set_headers(401)
+            self.wfile.write(json_bytes({"error": "Invalid or expired token"}))
+            return
+        conn = None
+        try:
+            conn = get_db_conn()
+            revoke_token(conn, claims)
+            self._set_headers(204)
+        except Exception as e:
+            self._set_headers(500)
+            self.wfile.write(json_bytes({"error": str(e)}))
+        finally:
+            if conn:
+                conn.close()
+
 
 def run(port=8080):
     # wait for DB to be reachable (simple retry) to reduce startup race with MySQL container
-    import time
     for _ in range(30):
         try:
+            if db_pool is None:
+                init_db_pool()
             c = get_db_conn()
+            apply_migrations(c, "User Service")
             c.close()
             break
-        except Exception:
+        except Exception as e:
+            print(f"User Service: Waiting for database or applying migrations... ({e})")
             time.sleep(1)
+    revocations.start("User Service")
+    start_tombstone_purge("User Service", "users")
     server_address = ("", port)
-    httpd = HTTPServer(server_address, UserHandler)
+    # Every request holds at most one pooled connection, so never run more workers than the pool can serve
+    workers = min(int(os.getenv("SERVER_WORKERS", str(DB_POOL_SIZE))), DB_POOL_SIZE)
+    httpd = make_server(server_address, UserHandler, workers)
     print(f"User Service running on http://localhost:{port}")
     httpd.serve_forever()
 